@@ -8,10 +8,13 @@ import sys
 import pyrana
 import pyrana.errors
 import pyrana.formats
-from pyrana.video import PixelFormat
+from pyrana.video import PixelFormat, ThreadType
 from pyrana.formats import MediaType
 
 
+THREADS = 4
+
+
 def process_file(srcname, dstname):
     sys.stdout.write("%s -> %s\n" % (srcname, dstname))
 
@@ -20,27 +23,31 @@ def process_file(srcname, dstname):
         sid = pyrana.formats.find_stream(dmx.streams,
                                          0,
                                          MediaType.AVMEDIA_TYPE_VIDEO)
-        vdec = dmx.open_decoder(sid)
+        vdec = dmx.open_decoder(sid, {'threads': THREADS,
+                                      'thread_type': ThreadType.FRAME})
         params = {
             'bit_rate': 800000,
             'width': 352,
             'height': 288,
             'time_base': (1, 25),
-            'pix_fmt': PixelFormat.AV_PIX_FMT_YUV420P
+            'pix_fmt': PixelFormat.AV_PIX_FMT_YUV420P,
+            'threads': THREADS,
+            'thread_type': ThreadType.SLICE
         }
         venc = pyrana.video.Encoder("mpeg1video", params)
         num = 0
-        while True:
-            frame = vdec.decode(dmx.stream(sid))
-            try:
-                pkt = venc.encode(frame)
-                dst.write(bytes(pkt))
+        try:
+            while True:
+                frame = vdec.decode(dmx.stream(sid))
+                for pkt in venc.encode_packets(frame):
+                    dst.write(bytes(pkt))
                 sys.stdout.write("encoded: %05i\r" % num)
-            except pyrana.errors.NeedFeedError:
-                sys.stderr.write("skipped: %05i\n" % num)
-            num += 1
+                num += 1
+        except pyrana.errors.EOSError:
+            pass
 
-    dst.writes(bytes(venc.flush()))
+        for pkt in venc.flush_packets():
+            dst.write(bytes(pkt))
     sys.stdout.write("\n")
 
 
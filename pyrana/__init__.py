@@ -4,7 +4,6 @@ multimedia files. Pyrana is based on the FFmpeg (http://ffmpeg.org)
 libraries, but provides an independent API.
 """
 
-from enum import Enum
 import platform
 
 from . import formats
@@ -55,34 +54,61 @@ from .common import blob
 
 # better explicit than implicit.
 # I don't like the black magic at import time.
-def setup():
+def setup(cache_dir=None):
     """
     initialized the underlying libav* libraries.
     you NEED to call this function before to access ANY attribute
     of the pyrana package.
     And this includes constants too.
+    If `cache_dir' is given, the registry of the supported formats
+    and codecs is cached there, to make the next setup()s faster.
     """
-    from .common import all_formats, all_codecs
+    from .common import registry, LazyEnum, MediaType
     from . import ff
-    ff.setup()
+    ffh = ff.setup()
+    if cache_dir is not None:
+        setattr(ffh, '_registry_cache_dir', cache_dir)
     # we know all the supported formats/codecs only *after* the
     # registration process. So we must do this wiring here.
+    # The enums are huge, so they are built only once used.
+    audio_t = MediaType.AVMEDIA_TYPE_AUDIO
+    video_t = MediaType.AVMEDIA_TYPE_VIDEO
     if formats.InputFormat is None or \
        formats.OutputFormat is None:
-        ifmts, ofmts = all_formats()
-        formats.InputFormat = Enum('InputFormat', ifmts)
-        formats.OutputFormat = Enum('OutputFormat', ofmts)
+        formats.InputFormat = LazyEnum(
+            'InputFormat', lambda: registry(ffh).input_formats)
+        formats.OutputFormat = LazyEnum(
+            'OutputFormat', lambda: registry(ffh).output_formats)
     if not audio.InputCodec or \
        not audio.OutputCodec or \
        not video.InputCodec or \
        not video.OutputCodec:
-        acods, vcods = all_codecs()
-        acodecs = Enum('AudioCodec', acods)
-        vcodecs = Enum('VideoCodec', vcods)
+        # InputCodec and OutputCodec are one and the same Enum,
+        # listing both the decoders and the encoders.
+        acodecs = LazyEnum(
+            'AudioCodec', lambda: registry(ffh).codec_names(audio_t))
+        vcodecs = LazyEnum(
+            'VideoCodec', lambda: registry(ffh).codec_names(video_t))
         audio.InputCodec = acodecs
         audio.OutputCodec = acodecs
         video.InputCodec = vcodecs
         video.OutputCodec = vcodecs
+    if not audio.DecoderCodec or \
+       not audio.EncoderCodec or \
+       not video.DecoderCodec or \
+       not video.EncoderCodec:
+        audio.DecoderCodec = LazyEnum(
+            'AudioDecoderCodec',
+            lambda: registry(ffh).decoder_names(audio_t))
+        audio.EncoderCodec = LazyEnum(
+            'AudioEncoderCodec',
+            lambda: registry(ffh).encoder_names(audio_t))
+        video.DecoderCodec = LazyEnum(
+            'VideoDecoderCodec',
+            lambda: registry(ffh).decoder_names(video_t))
+        video.EncoderCodec = LazyEnum(
+            'VideoEncoderCodec',
+            lambda: registry(ffh).encoder_names(video_t))
 
 
 __all__ = ['formats', 'audio', 'video', 'packet', 'errors']
@@ -4,10 +4,11 @@ Encoders, Decoders and their support code.
 """
 
 from enum import IntEnum
-from .common import to_sample_format
+from .common import to_sample_format, ContextCache
 from .codec import BaseFrame, BaseDecoder, BaseEncoder, bind_frame
 from .codec import Payload, make_payload, wire_decoder, wire_encoder
 from .codec import _new_av_frame_pp
+from .codec import ThreadType  # pylint: disable=W0611
 from .errors import ProcessingError, SetupError
 from . import ff
 # the following is just to export to the clients the Enums.
@@ -18,6 +19,11 @@ from .ffaclayout import ChannelLayout
 
 InputCodec = None  # to be filled in setup()
 OutputCodec = None  # to be filled in setup()
+DecoderCodec = None  # to be filled in setup(): the decoders only
+EncoderCodec = None  # to be filled in setup(): the encoders only
+
+
+SWR_CACHE_SIZE = 8  # SWResample contexts kept around by each Decoder.
 
 
 class AVRounding(IntEnum):
@@ -57,32 +63,69 @@ def _setup_av_frame_pp(ffh, ppframe, rate, layout, samplefmt, nsamples):
         raise ProcessingError('cannot allocate the samples buffer')
 
 
-def _samples_from_frame(ffh, parent, frame, smpfmt):
+def _free_swr(ffh, swr):
+    """
+    releases a SWResample context.
+    """
+    pswr = ffh.ffi.new('struct SwrContext **')
+    pswr[0] = swr
+    ffh.swr.swr_free(pswr)
+
+
+def _new_resamplers(ffh):
+    """
+    builds the cache of the SWResample contexts of a single stream.
+    """
+    return ContextCache(lambda swr: _free_swr(ffh, swr), SWR_CACHE_SIZE)
+
+
+def _samples_from_frame(ffh, parent, frame, smpfmt, resamplers=None):
     """
     builds an Samples from a C-frame, by converting the data
     into the given smpfmt. Assumes the source smpfmt is
     different from the source one; otherwise, you just
     need a new Samples with a shared underlying Frame
     (see Frame.samples()).
+    If the ContextCache `resamplers' of the stream is given, the
+    SWResample context is taken from it, and reused; otherwise
+    the context is used just for this conversion.
     """
     null = ffh.ffi.NULL
-    swr = ffh.swr.swr_alloc_set_opts(null,
-                                     frame.channel_layout,
-                                     smpfmt,
-                                     frame.sample_rate,
-                                     frame.channel_layout,
-                                     frame.format,
-                                     frame.sample_rate,
-                                     0,
-                                     null)
-    if not swr:
-        msg = "cannot get a SWResample context"
-        raise ProcessingError(msg)
-
-    ret = ffh.swr.swr_init(swr)
-    if ret < 0:
-        msg = "cannot initialize the resampling context"
-        raise ProcessingError(msg)
+
+    def _new_swr():
+        """
+        builds and initializes a brand new SWResample context
+        for this conversion.
+        """
+        swr = ffh.swr.swr_alloc_set_opts(null,
+                                         frame.channel_layout,
+                                         smpfmt,
+                                         frame.sample_rate,
+                                         frame.channel_layout,
+                                         frame.format,
+                                         frame.sample_rate,
+                                         0,
+                                         null)
+        if not swr:
+            msg = "cannot get a SWResample context"
+            raise ProcessingError(msg)
+
+        ret = ffh.swr.swr_init(swr)
+        if ret < 0:
+            _free_swr(ffh, swr)
+            msg = "cannot initialize the resampling context"
+            raise ProcessingError(msg)
+        return swr
+
+    # reusing the same context for all the frames of a stream
+    # also carries over any resampling state between them.
+    # A context must never be shared among different streams.
+    owned = resamplers is None
+    if owned:
+        swr = _new_swr()
+    else:
+        swr = resamplers.get((frame.channel_layout, frame.format,
+                              frame.sample_rate, smpfmt), _new_swr)
 
     with bind_frame(ffh) as ppframe:
         _setup_av_frame_pp(ffh,
@@ -97,8 +140,10 @@ def _samples_from_frame(ffh, parent, frame, smpfmt):
                                   frame.data,
                                   frame.nb_samples)
         if ret < 0:
+            if owned:
+                _free_swr(ffh, swr)
             raise ProcessingError('cannot convert the audio buffer')
-        return Samples.from_cdata(ppframe, swr, parent)
+        return Samples.from_cdata(ppframe, swr, parent, owned)
 
 
 class Samples(Payload):
@@ -111,20 +156,24 @@ class Samples(Payload):
         self._ppframe = None
         self._parent = None
         self._swr = None
+        self._swr_owned = False
         raise SetupError("Cannot be created directly. Yet.")
 
     @classmethod
-    def from_cdata(cls, ppframe, swr=None, parent=None):
+    def from_cdata(cls, ppframe, swr=None, parent=None, swr_owned=False):
         """
         builds a pyrana Image from a (cffi-wrapped) libav*
         Frame object. The Picture data itself will still be hold in the
         Frame object.
         The libav object must be already initialized and ready to go.
+        If `swr_owned' is True, the Samples releases the SWResample
+        context `swr' when it goes away.
         WARNING: raw access. Use with care.
         """
         ffh = ff.get_handle()
         samples = make_payload(cls, ffh, ppframe, parent)
         setattr(samples, '_swr', swr)
+        setattr(samples, '_swr_owned', swr_owned)
         return samples
 
     def __repr__(self):
@@ -137,6 +186,8 @@ class Samples(Payload):
     def __del__(self):
         if not self.is_shared:
             self._ff.lavc.avcodec_free_frame(self._ppframe)
+        if self._swr_owned:
+            _free_swr(self._ff, self._swr)
 
     def __len__(self):
         frm = self._ppframe[0]  # shortcut
@@ -187,7 +238,8 @@ class Samples(Payload):
         convert the Samples data in a new SampleFormat.
         returns a brand new, independent Image.
         """
-        return _samples_from_frame(self._ff, self, self._ppframe[0], smpfmt)
+        return _samples_from_frame(self._ff, self, self._ppframe[0], smpfmt,
+                                   getattr(self._parent, '_resamplers', None))
 
     @property
     def sample_format(self):
@@ -254,7 +306,9 @@ class Frame(BaseFrame):
         """
         if smpfmt is None:  # native data, no conversion
             return Samples.from_cdata(self._ppframe)
-        return _samples_from_frame(self._ff, self, self._ppframe[0], smpfmt)
+        # the frames built by a Decoder share its resampling contexts.
+        return _samples_from_frame(self._ff, self, self._ppframe[0], smpfmt,
+                                   getattr(self, '_resamplers', None))
 
 
 def fill_s16(frame):
@@ -271,6 +325,8 @@ def fill_s16(frame):
 class Decoder(BaseDecoder):
     """
     Decodes audio Packets into audio Frames.
+    Each Decoder keeps the SWResample contexts used to convert
+    the samples of its Frames, so they are reused along the stream.
     """
     @staticmethod
     def wire(dec):
@@ -278,9 +334,20 @@ class Decoder(BaseDecoder):
         wire up the Decoder. See codec.wire_decoder
         """
         ffh = ff.get_handle()
+        resamplers = _new_resamplers(ffh)
+
+        def new_frame(ppframe):
+            """
+            builds a Frame bound to the contexts of this Decoder.
+            """
+            frame = Frame.from_cdata(ppframe)
+            setattr(frame, '_resamplers', resamplers)
+            return frame
+
+        setattr(dec, '_resamplers', resamplers)
         return wire_decoder(dec,
                             ffh.lavc.avcodec_decode_audio4,
-                            Frame.from_cdata,
+                            new_frame,
                             "audio")
 
     def __init__(self, input_codec, params=None):
@@ -288,14 +355,14 @@ class Decoder(BaseDecoder):
         self.wire(self)
 
     @classmethod
-    def from_cdata(cls, ctx):
+    def from_cdata(cls, ctx, params=None):
         """
         builds a pyrana Audio Decoder from (around) a (cffi-wrapped) libav*
         (audio)decoder object.
         The libav object must be already initialized and ready to go.
         WARNING: raw access. Use with care.
         """
-        return cls.wire(BaseDecoder.from_cdata(ctx))
+        return cls.wire(BaseDecoder.from_cdata(ctx, params))
 
 
 class Encoder(BaseEncoder):
@@ -4,12 +4,14 @@ This module is not part of the pyrana public API.
 """
 
 from types import GeneratorType
+from collections import deque
 from contextlib import contextmanager
 from enum import IntEnum
 
-from .packet import Packet, raw_packet, bind_packet
+from .packet import Packet, raw_packet, bind_packet, TS_NULL
 from .common import PY3, MediaType, to_media_type, to_str, AttrDict, strerror
-from .errors import PyranaError, ProcessingError, SetupError
+from .common import set_field_int
+from .errors import PyranaError, ProcessingError, SetupError, NotFoundError
 from .errors import NeedFeedError, EOSError, WrongParameterError
 from . import ff
 
@@ -56,6 +58,35 @@ class CodecFlag2(IntEnum):
     SHOW_ALL = 0x00400000
 
 
+class ThreadType(IntEnum):
+    """
+    wrapper for the (wannabe) enum in avcodec.h
+    FF_THREAD_*
+    """
+    FRAME = 0x0001  # more than one frame at once
+    SLICE = 0x0002  # more than one part of a single frame at once
+
+
+class Discard(IntEnum):
+    """
+    wrapper for the enum AVDiscard in avcodec.h
+    what to skip, from nothing up to everything.
+    """
+    NONE = -16  # discard nothing
+    DEFAULT = 0  # discard useless packets like 0 size packets in avi
+    NONREF = 8  # discard all non reference
+    BIDIR = 16  # discard all bidirectional frames
+    NONKEY = 32  # discard all frames except keyframes
+    ALL = 48  # discard all
+
+
+# fields not exposed by the pseudo-headers, which are available
+# through AVOptions under a different name.
+_AV_OPT_NAMES = {
+    'thread_count': 'threads',
+}
+
+
 def make_codec(vcodec, acodec, stream_id, ctx, *args):
     """
     builds the right decoder for a given stream
@@ -89,8 +120,19 @@ def _setup_av_ctx(ctx, params):
             try:
                 setattr(ctx, name, value)
             except AttributeError:
-                msg = "unsupported parameter: %s" % name
-                raise WrongParameterError(msg)
+                _setup_av_opt(ctx, name, value)
+
+
+def _setup_av_opt(ctx, name, value):
+    """
+    update an AVCodecContext `ctx` field not exposed by the
+    pseudo-headers (e.g. the threading setup) through AVOptions.
+    """
+    try:
+        set_field_int(ctx, _AV_OPT_NAMES.get(name, name), value)
+    except (NotFoundError, TypeError, ValueError):
+        msg = "unsupported parameter: %s" % name
+        raise WrongParameterError(msg)
 
 
 class CodecMixin(object):
@@ -289,6 +331,12 @@ def make_fetcher(seq):
     Builds a callable which extracts, deletes from
     the originating sequence-like (either materialized
     or generating) and returns an item.
+    Deques and generators are consumed in O(1). Lists are walked
+    by index, and the items already fetched are deleted in batches,
+    once they are at least half of the list, or when the list is
+    exhausted: amortized O(1). Items appended to the list meanwhile
+    are fetched as well.
+    Raises StopIteration once the sequence is exhausted.
     """
     # meh, goodbye to duck typing. Do anyone has a better idea?
     if isinstance(seq, GeneratorType):
@@ -296,10 +344,31 @@ def make_fetcher(seq):
             """fetch from a generator"""
             return next(seq)
         return _fetch
+    elif isinstance(seq, deque):
+        def _fetch():
+            """fetch from a deque"""
+            try:
+                return seq.popleft()
+            except IndexError:
+                raise StopIteration
+        return _fetch
     elif isinstance(seq, list):
+        pos = [0]  # first item not yet fetched
+
         def _fetch():
             """fetch from a list"""
-            return seq.pop(0)
+            idx = pos[0]
+            if idx >= len(seq):
+                del seq[:idx]
+                pos[0] = 0
+                raise StopIteration
+            item = seq[idx]
+            idx += 1
+            if idx * 2 >= len(seq):
+                del seq[:idx]
+                idx = 0
+            pos[0] = idx
+            return item
         return _fetch
     else:
         raise ProcessingError("unsupported source type")
@@ -399,6 +468,36 @@ class BaseEncoder(CodecMixin):
         """
         return self._encode_frame(self._ff.ffi.NULL)
 
+    def encode_packets(self, frame):
+        """
+        Encode a logical frame and return the list of all the packets
+        made available by the Encoder, possibly none of them.
+        Unlike encode(), never raises NeedFeedError: encoders with
+        some delay (e.g. frame-threaded ones) just return an empty list
+        until they have an encoded packet ready, so they can be fed
+        with frames while the previous ones are still being encoded.
+        """
+        try:
+            return [self.encode(frame)]
+        except NeedFeedError:
+            return []
+
+    def flush_packets(self):
+        """
+        emits all the packets which may have been buffered (delayed)
+        by the Encoder as list, and empties such buffers.
+        Call it last, do not intermix with encode*() calls.
+        Unlike flush(), never raises NeedFeedError: returns an empty
+        list if all the internal buffers are already empty.
+        """
+        pkts = []
+        while True:
+            try:
+                _, pkt = self.flush()
+            except NeedFeedError:
+                return pkts
+            pkts.append(pkt)
+
     @classmethod
     def from_cdata(cls, ctx, params, codec=None):
         """
@@ -423,13 +522,26 @@ class BaseEncoder(CodecMixin):
         return muxer.register_stream(self._codec)
 
 
+def _frame_ts(cframe):
+    """
+    the best guess of the timestamp of a decoded C(ffi) frame.
+    """
+    return cframe.pkt_pts if cframe.pkt_pts != TS_NULL else cframe.pkt_dts
+
+
+def _pkt_ts(packet):
+    """
+    the best guess of the timestamp of an encoded Packet.
+    """
+    return packet.pts if packet.pts != TS_NULL else packet.dts
+
+
 class BaseDecoder(CodecMixin):
     """
     Decoder base class. Common both to audio and video decoders.
     """
     def __init__(self, input_codec, params=None, delay_open=False):
-        super(BaseDecoder, self).__init__()
-        # XXX: intentionally skip Params for now
+        super(BaseDecoder, self).__init__(params)
         ffh = self._ff
         if isinstance(input_codec, str):
             name = input_codec.encode('utf-8')
@@ -439,9 +551,12 @@ class BaseDecoder(CodecMixin):
         self._ctx = ffh.lavc.avcodec_alloc_context3(self._codec)
         self._av_decode = _null_av_decode
         self._new_frame = _null_new_frame
-        self._frames = []  # internal buffering
+        self._frames = deque()  # internal buffering
+        self._source = None  # (list, fetcher) being decoded
+        self._skip = Discard.DEFAULT  # frames the decoder always skips
         self._repr = "Decoder(input_codec=%s)"
         self._mtype = "abstract"
+        self.setup()
         if not delay_open:
             self.open()
 
@@ -499,23 +614,113 @@ class BaseDecoder(CodecMixin):
                 pkt.data += ret
                 pkt.size -= ret
 
+    def _fetcher(self, packets):
+        """
+        returns the fetcher for the given packets source.
+        The fetcher of a list is kept across calls, because it
+        remembers the position of the first packet not yet consumed.
+        """
+        if not isinstance(packets, list):
+            return make_fetcher(packets)
+        if self._source is None or self._source[0] is not packets:
+            self._source = (packets, make_fetcher(packets))
+        return self._source[1]
+
     def decode(self, packets):
         """
         Decode data from a logical stream of packets, and returns when
         the first next frame is available.
         The input stream can be
-        - a materialized sequence of packets (list, tuple...)
+        - a materialized sequence of packets (list, deque)
         - a generator (e.g. Demuxer.stream()).
+        The packets fed into the decoder are consumed; lists are
+        consumed in batches (see make_fetcher), so append to them
+        freely, but don't remove nor insert packets while decoding.
+        In keyframes_only mode, the other packets are just dropped.
         """
-        fetch = make_fetcher(packets)
+        fetch = self._fetcher(packets)
+        keyonly = self._skip >= Discard.NONKEY
         while not self._frames:
             try:
-                self._frames.extend(frm for frm in self.decode_packet(fetch()))
+                pkt = fetch()
+                if keyonly and not pkt.is_key:
+                    continue
+                self._frames.extend(frm for frm in self.decode_packet(pkt))
             except NeedFeedError:
                 continue
             except StopIteration:
                 raise EOSError
-        return self._frames.pop(0)
+        return self._frames.popleft()
+
+    def decode_to(self, packets, tstamp):
+        """
+        Decode data from a logical stream of packets, like decode(),
+        which must begin with a keyframe (see Demuxer.seek_frame),
+        and returns the first frame at or after the given timestamp.
+        Does the least work to get there: the frames before it are
+        dropped without any conversion, and the non-reference ones
+        are not decoded at all.
+        The frames following it are returned by decode(), as usual.
+        """
+        fetch = self._fetcher(packets)
+        self.flush_buffers()
+        skipping = False
+        try:
+            while True:
+                try:
+                    pkt = fetch()
+                except StopIteration:
+                    raise EOSError
+                early = TS_NULL < _pkt_ts(pkt) < tstamp
+                if early != skipping:
+                    skipping = early
+                    self._set_skip_frame(max(Discard.NONREF, self._skip)
+                                         if early else self._skip)
+                frames = []
+                try:
+                    # like decode(), keeps the frames decoded
+                    # before the packet ran out of data.
+                    frames.extend(frm for frm in self.decode_packet(pkt))
+                except NeedFeedError:
+                    pass
+                for idx, frame in enumerate(frames):
+                    if _frame_ts(frame.cdata) >= tstamp:
+                        self._frames.extend(frames[idx + 1:])
+                        return frame
+        finally:
+            if skipping:
+                self._set_skip_frame(self._skip)
+
+    def _set_skip_frame(self, discard):
+        """
+        tells the decoder which frames to skip decoding.
+        """
+        set_field_int(self._ctx, 'skip_frame', discard)
+
+    @property
+    def keyframes_only(self):
+        """
+        boolean flag. Does the decoder decode only the keyframes?
+        In this mode, decode() drops all the other packets, and the
+        codec itself skips all the other frames, so it is much faster
+        if you just need some frames here and there, e.g. thumbnails.
+        Pair with Demuxer.keyframes().
+        """
+        return self._skip >= Discard.NONKEY
+
+    @keyframes_only.setter
+    def keyframes_only(self, value):
+        self._skip = Discard.NONKEY if value else Discard.DEFAULT
+        self._set_skip_frame(self._skip)
+
+    def flush_buffers(self):
+        """
+        drops all the data buffered into the Decoder, both the frames
+        already decoded and the ones being reconstructed.
+        Call it after any seek in the stream being decoded.
+        """
+        self._frames.clear()
+        self._ff.lavc.avcodec_flush_buffers(self._ctx)
 
     def flush(self):
         """
@@ -530,7 +735,7 @@ class BaseDecoder(CodecMixin):
             return frame
 
     @classmethod
-    def from_cdata(cls, ctx):
+    def from_cdata(cls, ctx, params=None):
         """
         builds a pyrana Decoder from (around) a (cffi-wrapped) libav*
         decoder object.
@@ -539,16 +744,19 @@ class BaseDecoder(CodecMixin):
         """
         ffh = ff.get_handle()
         dec = object.__new__(cls)
-        CodecMixin.__init__(dec, {})  # MUST be explicit
+        CodecMixin.__init__(dec, params)  # MUST be explicit
         ctx.codec = ffh.lavc.avcodec_find_decoder(ctx.codec_id)
         setattr(dec, '_codec', ctx.codec)
         setattr(dec, '_ctx', ctx)
         setattr(dec, '_av_decode', _null_av_decode)
         setattr(dec, '_new_frame', _null_new_frame)
-        setattr(dec, '_frames', [])  # internal buffering
+        setattr(dec, '_frames', deque())  # internal buffering
+        setattr(dec, '_source', None)
+        setattr(dec, '_skip', Discard.DEFAULT)
         setattr(dec, '_got_data', None)
         setattr(dec, '_mtype', "abstract")
         setattr(dec, '_repr', "Decoder(input_codec=%s)")
+        dec.setup()
         return dec.open()
 
 
@@ -3,8 +3,14 @@ common code which do not fits better elsewhere.
 This module is not part of the pyrana public API.
 """
 
+import json
+import os
+import os.path
 import platform
-from enum import IntEnum
+import tempfile
+import threading
+from collections import OrderedDict
+from enum import Enum, IntEnum
 from . import ff, errors
 from .ffenums import PixelFormat, SampleFormat, PictureType
 
@@ -81,6 +87,88 @@ class AttrDict(object):
             self._attrs[key] = value
 
 
+class ContextCache(object):
+    """
+    Bounded, least-recently-used cache of libav* contexts
+    (e.g. scaling or resampling contexts), indexed by the parameters
+    they were built with. Evicted contexts are released through the
+    given `free' callable, so they don't leak, like the ones still
+    cached when the ContextCache goes away.
+    Not thread safe, like the contexts it holds: use one per thread
+    (see handle_cache()).
+    """
+    def __init__(self, free, capacity=8):
+        self._free = free
+        self._capacity = max(1, capacity)
+        self._ctxs = OrderedDict()
+
+    def __del__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self._ctxs)
+
+    def __contains__(self, key):
+        return key in self._ctxs
+
+    @property
+    def capacity(self):
+        """
+        the maximum number of contexts held in the cache.
+        """
+        return self._capacity
+
+    def get(self, key, make):
+        """
+        returns the context cached for `key', building it through
+        the `make' callable (and caching it) if it is not found.
+        `make' is expected to raise if it cannot build the context.
+        """
+        try:
+            ctx = self._ctxs.pop(key)
+        except KeyError:
+            ctx = make()
+        self._ctxs[key] = ctx  # now it is the most recently used.
+        while len(self._ctxs) > self._capacity:
+            _, old = self._ctxs.popitem(last=False)
+            self._free(old)
+        return ctx
+
+    def clear(self):
+        """
+        releases all the cached contexts.
+        """
+        while self._ctxs:
+            _, old = self._ctxs.popitem(last=False)
+            self._free(old)
+
+
+_HANDLE_CACHE_LOCK = threading.Lock()
+
+
+def handle_cache(ffh, name, free, capacity):
+    """
+    returns the ContextCache called `name' bound to the given FF handle
+    and to the calling thread, creating it if needed. Binding the caches
+    to the handle ensures the contexts are always released by the
+    library which built them. Each thread gets its own cache, because
+    the contexts can't be used concurrently, and the cached contexts
+    are released when the thread ends.
+    """
+    local = getattr(ffh, name, None)
+    if local is None:
+        with _HANDLE_CACHE_LOCK:
+            local = getattr(ffh, name, None)
+            if local is None:
+                local = threading.local()
+                setattr(ffh, name, local)
+    cache = getattr(local, 'cache', None)
+    if cache is None:
+        cache = ContextCache(free, capacity)
+        local.cache = cache
+    return cache
+
+
 class MediaType(IntEnum):
     """wraps the Media Types in libavutil/avutil.h"""
     AVMEDIA_TYPE_UNKNOWN = -1
@@ -92,6 +180,20 @@ class MediaType(IntEnum):
     AVMEDIA_TYPE_NB = 5
 
 
+def to_path_bytes(path):
+    """
+    convert a filesystem path (text, bytes or, on python >= 3.6,
+    any path-like object) in the bytes libav* expects.
+    Text is encoded as UTF-8; bytes are taken as they are.
+    """
+    fspath = getattr(os, 'fspath', None)
+    if fspath is not None:
+        path = fspath(path)
+    if isinstance(path, bytes):
+        return path
+    return path.encode('utf-8')
+
+
 def to_str(cstr, ffi=None):
     """
     convert a C(ffi) string in a proper python string.
@@ -102,46 +204,78 @@ def to_str(cstr, ffi=None):
     return ffi.string(cstr).decode('utf-8')
 
 
+def cdata_view(ffi, cdata, size, owner):
+    """
+    builds a zero-copy memoryview over `size' bytes of C memory
+    pointed by `cdata'. The view (and everything built on top of it,
+    e.g. NumPy arrays) keeps `owner' alive, so the C memory can't
+    be released under its feet.
+    """
+    # the destructor does nothing but holding a reference to the owner,
+    # and the buffer holds a reference to the gc'd pointer.
+    keepalive = ffi.gc(ffi.cast('uint8_t *', cdata), lambda _: owner)
+    return memoryview(ffi.buffer(keepalive, size))
+
+
+_ENUM_RMAPS = {}
+
+
+def enum_rmap(enum_class, starter=-1):
+    """
+    returns the (cached) reverse lookup table from integer values
+    to enumerators for the given enumeration.
+    The table is built once on first use.
+    """
+    key = (enum_class, starter)
+    rmap = _ENUM_RMAPS.get(key)
+    if rmap is None:
+        rmap = dict(enumerate(enum_class, starter))
+        _ENUM_RMAPS[key] = rmap
+    return rmap
+
+
 def to_enum_value(ival, enum_class, fallback, starter=-1):
     """
     convert the integer argument to the corresponding
     enumerator value on the given enumeration, if feasible,
     or the fallback value otherwise.
     """
-    rmap = dict(enumerate(enum_class, starter))
-    return rmap.get(ival, fallback)
+    return enum_rmap(enum_class, starter).get(ival, fallback)
+
+
+# precomputed for the converters used on the hot paths.
+_MEDIA_TYPE_RMAP = enum_rmap(MediaType)
+_PIXEL_FORMAT_RMAP = enum_rmap(PixelFormat)
+_SAMPLE_FORMAT_RMAP = enum_rmap(SampleFormat)
+_PICTURE_TYPE_RMAP = enum_rmap(PictureType)
 
 
 def to_media_type(ival):
     """
     MediaType value converter.
     """
-    return to_enum_value(ival, MediaType,
-                         MediaType.AVMEDIA_TYPE_UNKNOWN)
+    return _MEDIA_TYPE_RMAP.get(ival, MediaType.AVMEDIA_TYPE_UNKNOWN)
 
 
 def to_pixel_format(ival):
     """
     PixelFormat value converter.
     """
-    return to_enum_value(ival, PixelFormat,
-                         PixelFormat.AV_PIX_FMT_NONE)
+    return _PIXEL_FORMAT_RMAP.get(ival, PixelFormat.AV_PIX_FMT_NONE)
 
 
 def to_sample_format(ival):
     """
     SampleFormat value converter.
     """
-    return to_enum_value(ival, SampleFormat,
-                         SampleFormat.AV_SAMPLE_FMT_NONE)
+    return _SAMPLE_FORMAT_RMAP.get(ival, SampleFormat.AV_SAMPLE_FMT_NONE)
 
 
 def to_picture_type(ival):
     """
     PictureType value converter.
     """
-    return to_enum_value(ival, PictureType,
-                         PictureType.AV_PICTURE_TYPE_NONE)
+    return _PICTURE_TYPE_RMAP.get(ival, PictureType.AV_PICTURE_TYPE_NONE)
 
 
 AV_ERROR_MAX_STRING_SIZE = 64
@@ -169,30 +303,15 @@ def _iter_fmts(ffi, format_next):
         fmt = format_next(fmt)
 
 
-def _find_format_by_name(name, next_fmt):
-    """
-    do not use outside pyrana.
-    finds a given format by name.
-    Requires an explicit iterator callable, and that's
-    exactly the reason why you should'nt use this outside pyrana.
-    """
-    ffh = ff.get_handle()
-    for fname, fdesc in _iter_fmts(ffh.ffi, next_fmt):
-        if name == fname:
-            return fdesc
-    raise errors.UnsupportedError
-
-
-def find_source_format(name=None):
+def _format_names(ffi, format_next):
     """
-    find and return the right source libavformat format descriptor
-    by name. None/ffi.NULL just means autodetect.
+    the sorted names of all the formats iterated by format_next,
+    ungrouping the names if necessary.
     """
-    ffh = ff.get_handle()
-    fmt = ffh.ffi.NULL
-    if name is not None:
-        fmt = _find_format_by_name(name, ffh.lavf.av_iformat_next)
-    return fmt
+    names = set()
+    for name, _ in _iter_fmts(ffi, format_next):
+        names.update(name.split(','))
+    return sorted(names)
 
 
 def _iter_codec(ffi, codec_next):
@@ -207,42 +326,274 @@ def _iter_codec(ffi, codec_next):
         codec = codec_next(codec)
 
 
-def all_formats():
+def _codec_names(codecs, media_type):
     """
-    builds the sets of the formats supported by
-    libavformat, and which, in turn, by pyrana.
+    the sorted names of the codecs of the given MediaType.
     """
-    ffh = ff.get_handle()
+    return sorted(name for name, _type in codecs.items()
+                  if _type == media_type)
+
+
+# bump on any change of the on-disk cache layout.
+REGISTRY_VERSION = 1
 
-    def fill_fmts(fmt_iter):
+
+class Registry(object):
+    """
+    the formats and codecs supported by the libav* libraries,
+    indexed by name. Built once, after the libraries registration;
+    use registry() to get it.
+    decoders and encoders map the codec names to their MediaType.
+    """
+    def __init__(self, input_formats, output_formats, decoders, encoders):
+        self.input_formats = frozenset(input_formats)
+        self.output_formats = frozenset(output_formats)
+        self.decoders = dict(decoders)
+        self.encoders = dict(encoders)
+        self._iformats = {}
+
+    def __repr__(self):
+        return "Registry(formats=%i/%i, codecs=%i/%i)" % (
+            len(self.input_formats), len(self.output_formats),
+            len(self.decoders), len(self.encoders))
+
+    @classmethod
+    def from_libs(cls, ffh):
+        """
+        builds a Registry walking through the libav* libraries.
         """
-        fill the format set, by ungrouping the names
-        if necessary.
+        decoders, encoders = {}, {}
+        for name, _type, codec in _iter_codec(ffh.ffi,
+                                              ffh.lavc.av_codec_next):
+            if ffh.lavc.av_codec_is_decoder(codec):
+                decoders.setdefault(name, _type)
+            if ffh.lavc.av_codec_is_encoder(codec):
+                encoders.setdefault(name, _type)
+        return cls(_format_names(ffh.ffi, ffh.lavf.av_iformat_next),
+                   _format_names(ffh.ffi, ffh.lavf.av_oformat_next),
+                   decoders, encoders)
+
+    @classmethod
+    def from_dict(cls, data):
         """
-        fmts = set()
-        for name, _ in _iter_fmts(ffh.ffi, fmt_iter):
-            for part in name.split(','):
-                fmts.add((part, part))
-        return fmts
+        builds a Registry from the output of to_dict().
+        """
+        return cls(data['input_formats'], data['output_formats'],
+                   ((name, MediaType(_type))
+                    for name, _type in data['decoders'].items()),
+                   ((name, MediaType(_type))
+                    for name, _type in data['encoders'].items()))
 
-    ifmts = fill_fmts(ffh.lavf.av_iformat_next)
-    ofmts = fill_fmts(ffh.lavf.av_oformat_next)
-    return (ifmts, ofmts)
+    def to_dict(self):
+        """
+        the content of the registry, as plain builtin types.
+        """
+        return {
+            'input_formats': sorted(self.input_formats),
+            'output_formats': sorted(self.output_formats),
+            'decoders': dict((name, int(_type))
+                             for name, _type in self.decoders.items()),
+            'encoders': dict((name, int(_type))
+                             for name, _type in self.encoders.items()),
+        }
+
+    def codec_names(self, media_type):
+        """
+        the names of the codecs, decoders or encoders,
+        of the given MediaType.
+        """
+        codecs = dict(self.decoders)
+        codecs.update(self.encoders)
+        return _codec_names(codecs, media_type)
+
+    def decoder_names(self, media_type):
+        """
+        the names of the decoders of the given MediaType.
+        """
+        return _codec_names(self.decoders, media_type)
+
+    def encoder_names(self, media_type):
+        """
+        the names of the encoders of the given MediaType.
+        """
+        return _codec_names(self.encoders, media_type)
+
+    def input_format(self, ffh, name):
+        """
+        finds the libavformat input format descriptor by name.
+        Grouped names (e.g. "matroska,webm") are accepted as well.
+        """
+        fmt = self._iformats.get(name)
+        if fmt is None:
+            # input_formats holds the ungrouped names.
+            if not all(part in self.input_formats
+                       for part in name.split(',')):
+                raise errors.UnsupportedError("unknown format: %s" % name)
+            fmt = ffh.lavf.av_find_input_format(name.encode('utf-8'))
+            if fmt == ffh.ffi.NULL:
+                raise errors.UnsupportedError("unknown format: %s" % name)
+            self._iformats[name] = fmt
+        return fmt
+
+
+def _registry_path(cache_dir, versions):
+    """
+    the path of the on-disk registry cache for the libraries versions.
+    """
+    tag = '-'.join('%i.%i.%i' % tuple(ver) for ver in versions)
+    return os.path.join(cache_dir, 'registry-%i-%s.json' % (
+        REGISTRY_VERSION, tag))
+
+
+def _load_registry(path):
+    """
+    loads a Registry from the on-disk cache, if available.
+    """
+    try:
+        with open(path, 'r') as src:
+            return Registry.from_dict(json.load(src))
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _store_registry(path, reg):
+    """
+    stores the Registry in the on-disk cache. Best effort.
+    """
+    try:
+        cache_dir = os.path.dirname(path)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        with tempfile.NamedTemporaryFile('w', dir=cache_dir,
+                                         delete=False) as dst:
+            json.dump(reg.to_dict(), dst)
+        os.rename(dst.name, path)
+    except (IOError, OSError):
+        pass  # the cache is just an optimization
+
+
+def registry(ffh=None, cache_dir=None):
+    """
+    returns the Registry of the formats and codecs, building it
+    on the first call. If `cache_dir' is given, the Registry is loaded
+    from (or saved into) a cache file in that directory, keyed by
+    the libraries versions. Defaults to the one given to setup().
+    """
+    if ffh is None:
+        ffh = ff.get_handle()
+    reg = getattr(ffh, '_registry', None)
+    if reg is None:
+        if cache_dir is None:
+            cache_dir = getattr(ffh, '_registry_cache_dir', None)
+        path = None
+        if cache_dir is not None:
+            path = _registry_path(cache_dir, ffh.versions())
+            reg = _load_registry(path)
+        if reg is None:
+            reg = Registry.from_libs(ffh)
+            if path is not None:
+                _store_registry(path, reg)
+        setattr(ffh, '_registry', reg)
+    return reg
+
+
+class LazyEnum(object):
+    """
+    stands for an Enum whose members are named and valued as the
+    names returned by `make_names', built on first use, in order
+    to save the cost of building huge Enums never used.
+    Behaves like the Enum it wraps.
+    """
+    def __init__(self, name, make_names):
+        self._name = name
+        self._make_names = make_names
+        self._enum = None
+
+    def _get(self):
+        """
+        returns the wrapped Enum, building it if needed.
+        """
+        if self._enum is None:
+            names = sorted(self._make_names())
+            self._enum = Enum(self._name, [(name, name) for name in names])
+        return self._enum
+
+    def __getattr__(self, name):
+        if name in ('_name', '_make_names', '_enum'):
+            raise AttributeError(name)  # not yet initialized
+        return getattr(self._get(), name)
+
+    def __repr__(self):
+        return repr(self._get())
+
+    def __bool__(self):
+        return True  # without building the Enum
+
+    __nonzero__ = __bool__  # python 2.x
+
+    def __len__(self):
+        return len(self._get())
+
+    def __iter__(self):
+        return iter(self._get())
+
+    def __contains__(self, item):
+        return item in self._get()
+
+    def __getitem__(self, name):
+        return self._get()[name]
+
+    def __call__(self, value):
+        return self._get()(value)
+
+    def __instancecheck__(self, instance):
+        return isinstance(instance, self._get())
+
+    @property
+    def built(self):
+        """
+        was the Enum already built?
+        """
+        return self._enum is not None
+
+
+def find_source_format(name=None):
+    """
+    find and return the right source libavformat format descriptor
+    by name. None/ffi.NULL just means autodetect.
+    """
+    ffh = ff.get_handle()
+    fmt = ffh.ffi.NULL
+    if name is not None:
+        fmt = registry(ffh).input_format(ffh, name)
+    return fmt
+
+
+def all_formats():
+    """
+    builds the sets of the formats supported by
+    libavformat, and which, in turn, by pyrana.
+    """
+    reg = registry()
+    return (set((name, name) for name in reg.input_formats),
+            set((name, name) for name in reg.output_formats))
 
 
 def all_codecs():
     """
-    builds the lists of the codecs supported by
+    builds the sets of the codecs supported by
     libavcodec, and which, in turn, by pyrana.
-    BUG? Do not distinguish between enc and dec.
+    Does not distinguish between encoders and decoders;
+    use registry() for that.
     """
-    ffh = ff.get_handle()
+    reg = registry()
     audio, video = set(), set()
-    for name, _type, _ in _iter_codec(ffh.ffi, ffh.lavc.av_codec_next):
-        if _type == MediaType.AVMEDIA_TYPE_AUDIO:
-            audio.add((name, name))
-        elif _type == MediaType.AVMEDIA_TYPE_VIDEO:
-            video.add((name, name))
+    for codecs in (reg.decoders, reg.encoders):
+        for name, _type in codecs.items():
+            if _type == MediaType.AVMEDIA_TYPE_AUDIO:
+                audio.add((name, name))
+            elif _type == MediaType.AVMEDIA_TYPE_VIDEO:
+                video.add((name, name))
     return (audio, video)
 
 
@@ -259,3 +610,16 @@ def get_field_int(ffobj, name):
         msg = "cannot fetch the field '%s'" % name
         raise errors.NotFoundError(msg)
     return out_val[0]
+
+
+def set_field_int(ffobj, name, value):
+    """
+    generic field mutator through libav* facilities.
+    sets the integer field with value `name' of the
+    C-data object `ffobj' to `value'.
+    """
+    ffh = ff.get_handle()
+    err = ffh.lavu.av_opt_set_int(ffobj, name.encode('utf-8'), int(value), 0)
+    if err < 0:
+        msg = "cannot set the field '%s'" % name
+        raise errors.NotFoundError(msg)
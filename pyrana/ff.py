@@ -5,6 +5,8 @@ This module is not part of the pyrana public API.
 
 from functools import wraps
 import ctypes
+import hashlib
+import importlib
 import platform
 import os
 import os.path
@@ -116,6 +118,40 @@ class HLoader(object):
         self._vers = vers
 
 
+def module_name(hfiles):
+    """
+    name of the precompiled FFI module for the given hfiles.
+    Includes a digest of their names and content, so any change in the
+    hfiles makes a stale module to be just ignored, while the name does
+    not depend on where the hfiles are (e.g. build tree vs install tree).
+    """
+    sha = hashlib.sha1()
+    for hfile in hfiles:
+        sha.update(os.path.basename(hfile).encode('utf-8'))
+        with open(hfile, 'rb') as src:
+            sha.update(src.read())
+    digest = sha.hexdigest()
+    names = [os.path.splitext(os.path.basename(hfile))[0]
+             for hfile in hfiles]
+    return '_ffi_%s_%s' % ('_'.join(names), digest[:8])
+
+
+def _load_ffi(hfiles):
+    """
+    returns the FFI instance for the given hfiles and a flag
+    telling if it comes from a precompiled module
+    (see tools/build_ffi.py). Falls back to parse the hfiles.
+    """
+    try:
+        mod = importlib.import_module('.%s' % module_name(hfiles),
+                                      __package__)
+        return mod.ffi, True
+    except ImportError:
+        ffi = cffi.FFI()
+        ffi.cdef(_gather(hfiles))
+        return ffi, False
+
+
 def _try_to_load(lib, vers):
     """
     load the first found version of the given library,
@@ -164,8 +200,7 @@ class FF(object):
         vers = versions()
         self._vers = vers
         _hl = HLoader(self._vers)
-        self.ffi = cffi.FFI()
-        self.ffi.cdef(_hl.decls)
+        self.ffi, self.precompiled = _load_ffi(_hl.hfiles)
         lavu, lavc, lavf, sws, swr = vers
         self.lavc = self.ffi.dlopen(tmpl % ("avcodec", lavc[0]))
         self.lavf = self.ffi.dlopen(tmpl % ("avformat", lavf[0]))
@@ -9,10 +9,13 @@ from enum import IntEnum
 
 from .common import MediaType, AttrDict, to_media_type
 from .common import find_source_format, get_field_int, strerror
-from .iobridge import iosink, iosource
-from .packet import Packet, _new_cpkt
+from .common import to_path_bytes
+from .iobridge import iosink, iosource, IO_BUF_SIZE
+from .iobridge import CoalescingSink, ReadAhead
+from .packet import Packet, PacketBatch, _new_cpkt, TS_NULL
+from .index import KeyframeIndex
 from .codec import make_codec, find_encoder
-from .codec import CodecFlag
+from .codec import CodecFlag, Discard
 from . import audio  # see #1 below
 from . import video  # see #1 below
 from . import ff, errors
@@ -82,6 +85,9 @@ class FormatFlags(IntEnum):
     AVFMT_FLAG_KEEP_SIDE_DATA = 0x40000
 
 
+AVIO_FLAG_WRITE = 2
+
+
 class AVFmtFlags(IntEnum):
     """
     wrapper for the (wannabe)enum
@@ -150,10 +156,12 @@ def _video_stream_info(ctx):
     ))
 
 
-def _read_frame(ffh, ctx, new_pkt, stream_id):
+def _read_frame(ffh, ctx, new_pkt, stream_id, pool=None):
     """
     frame pulling function, made separate and private
     for easier testing. Returns the first valid packet.
+    The C packet is given back to the (optional) `pool'
+    once the packet is released, or right away if no packet is read.
     You should not use this directly; use a Demuxer instead.
     """
     pkt = new_pkt(ffh, 0)
@@ -161,6 +169,8 @@ def _read_frame(ffh, ctx, new_pkt, stream_id):
     while True:
         err = av_read_frame(ctx, pkt)
         if err < 0:
+            if pool is not None:
+                pool.release(pkt)
             if ffh.lavf.url_feof(ctx.pb):
                 raise errors.EOSError()
             else:
@@ -169,7 +179,56 @@ def _read_frame(ffh, ctx, new_pkt, stream_id):
         if stream_id == STREAM_ANY or pkt.stream_index == stream_id:
             break
         ffh.lavc.av_free_packet(pkt)
-    return Packet.from_cdata(pkt)
+    return Packet.from_cdata(pkt, pool)
+
+
+def _read_frames(ffh, ctx, new_pkt, stream_id, count, pool=None):
+    """
+    batch frame pulling function, made separate and private
+    for easier testing. Returns a PacketBatch of up to `count'
+    valid packets; the batch is short only at the end of the stream,
+    or if reading fails after some packets were read: in the latter
+    case the error is stored as the `error' attribute of the batch.
+    The C packet is given back to the (optional) `pool' once done.
+    You should not use this directly; use a Demuxer instead.
+    """
+    batch = PacketBatch()
+    pkt = new_pkt(ffh, 0)  # reused for every packet
+    # shortcuts to speedup
+    av_read_frame = ffh.lavf.av_read_frame
+    av_free_packet = ffh.lavc.av_free_packet
+    buf = ffh.ffi.buffer
+    try:
+        while len(batch) < count:
+            err = av_read_frame(ctx, pkt)
+            if err < 0:
+                if not ffh.lavf.url_feof(ctx.pb):
+                    msg = "error while reading data: %i" % err
+                    if not batch:
+                        raise errors.ProcessingError(msg)
+                    batch.error = errors.ProcessingError(msg)
+                elif not batch:
+                    raise errors.EOSError()
+                break
+            if stream_id == STREAM_ANY or pkt.stream_index == stream_id:
+                batch.append(pkt.stream_index, pkt.pts, pkt.dts, pkt.flags,
+                             buf(pkt.data, pkt.size))
+            av_free_packet(pkt)
+    finally:
+        if pool is not None:
+            pool.release(pkt)
+    return batch
+
+
+def _set_discard(ctx, wanted):
+    """
+    lets libavformat drop by itself the packets of all the streams
+    not `wanted' (set of stream ids), or of none if `wanted' is empty.
+    You should not use this directly; use a Demuxer instead.
+    """
+    for idx in range(ctx.nb_streams):
+        keep = not wanted or idx in wanted
+        ctx.streams[idx].discard = Discard.DEFAULT if keep else Discard.ALL
 
 
 def _tb_to_str(timebase):
@@ -202,6 +261,10 @@ class Demuxer(object):
     returning bytes (not strings).
     If the file format is_seekable but the file-like doesn't support
     seek, expect weird things.
+    Set the `index' attribute to a KeyframeIndex of the source
+    to enable the index-based seeks.
+    Once some streams are wanted (see want_stream()), the packets
+    of all the others are dropped by libavformat.
     """
     def _ensure_ready(self):
         """
@@ -215,34 +278,89 @@ class Demuxer(object):
         ensures the given stream_id is valid, and the demuxer is ready.
         """
         nstreams = len(self.streams)
-        if stream_id < 0 or stream_id > nstreams:
-            msg = "invalid stream id not in [0,%i]" % nstreams
+        if stream_id < 0 or stream_id >= nstreams:
+            msg = "invalid stream id not in [0,%i)" % nstreams
             raise errors.ProcessingError(msg)
 
-    def __init__(self, src, name=None, delay_open=False, streaming=False):
+    def __init__(self, src, name=None, delay_open=False, streaming=False,
+                 pool=None, bufsize=IO_BUF_SIZE, size_hint=None,
+                 readahead=False):
         """
         Demuxer(src, name="")
         Initialize a new demuxer for the file type `name';
         Use "" (empty) for auto probing.
         A Demuxer needs a RawIOBase-compliant as a source of data.
         The RawIOBase-compliant object must be already open.
+        In-memory data (bytes, bytearray, memoryview, mmap) can be
+        used directly as source, and is read without any file-like.
+        If a PacketPool is given as `pool', the Demuxer reuses its
+        packets instead of allocating new ones.
+        `bufsize' is the size in bytes of the I/O buffer: larger
+        buffers mean fewer reads from `src'.
+        `size_hint' is the size in bytes of `src', to be used if
+        it cannot be found by seeking or by stat()ing `src'.
+        If `readahead' is True, a background thread reads `src' ahead
+        of the demuxing; this makes the Demuxer streaming. Give
+        an iobridge.ReadAhead as `src' to tune it: the Demuxer takes
+        ownership of it, and closes it when closed.
+        """
+        self._setup(pool)
+        ffh = self._ff  # shortcut
+        if not isinstance(src, ReadAhead) and readahead:
+            src = ReadAhead(src)
+        if isinstance(src, ReadAhead):
+            self._readahead = src
+            streaming = True
+        self._src = iosource(src, streaming, bufsize,
+                             size_hint=size_hint)
+        self._pctx[0] = ffh.lavf.avformat_alloc_context()
+        self._pctx[0].pb = self._src.avio
+        self._pctx[0].flags |= FormatFlags.AVFMT_FLAG_CUSTOM_IO
+        if not delay_open:
+            self.open(name)
+
+    def _setup(self, pool):
+        """
+        sets up the state shared by all the Demuxer flavours.
         """
         self._ff = ff.get_handle()
         ffh = self._ff  # shortcut
         self._streams = []
+        self._pool = pool
+        self._new_pkt = _new_cpkt if pool is None else pool.new_cpkt
         self._pctx = ffh.ffi.new('AVFormatContext **')
         # cffi purposefully doesn't have an address-of (C's &) operator.
         # but libavformat requires a pointer-to-pointer as context argument,
         # so we need to allocate a simple lone double pointer
         # to act as junction.
         self._tb_q = _time_base_q(ffh)
-        self._src = iosource(src, streaming)
-        self._pctx[0] = ffh.lavf.avformat_alloc_context()
-        self._pctx[0].pb = self._src.avio
-        self._pctx[0].flags |= FormatFlags.AVFMT_FLAG_CUSTOM_IO
+        self._src = None
+        self._readahead = None
+        self.index = None
+        self._path = bytes()
+        self._wanted = set()
+        self._read_error = None  # to be raised by the next read_frames()
         self._ready = False
+
+    @classmethod
+    def from_path(cls, path, name=None, delay_open=False, pool=None,
+                  index=False):
+        """
+        builds a Demuxer which reads the file at `path' by itself,
+        without any Python code in the I/O loop.
+        Prefer this over a file-like for local files.
+        `path' can be text, bytes or a path-like object.
+        If `index' is True, the Demuxer gets the KeyframeIndex
+        of the file, loaded from its sidecar or built (and saved).
+        """
+        dmx = object.__new__(cls)
+        dmx._setup(pool)
+        dmx._path = to_path_bytes(path)
+        if index:
+            dmx.index = KeyframeIndex.from_path(path)
         if not delay_open:
-            self.open(name)
+            dmx.open(name)
+        return dmx
 
     def __del__(self):
         self.close()
@@ -267,15 +385,16 @@ class Demuxer(object):
         """
         if self._pctx[0] != self._ff.ffi.NULL:
             self._ff.lavf.avformat_close_input(self._pctx)
+        if self._readahead is not None:
+            self._readahead.close()
 
     def open(self, name=None):
         """
         open the underlying demuxer.
         """
         ffh = self._ff
-        filename = bytes()
         fmt = find_source_format(name)
-        err = ffh.lavf.avformat_open_input(self._pctx, filename,
+        err = ffh.lavf.avformat_open_input(self._pctx, self._path,
                                            fmt, ffh.ffi.NULL)
         if err < 0:
             raise errors.SetupError("open error=%i" % err)
@@ -286,15 +405,36 @@ class Demuxer(object):
 
     def seek_frame(self, frameno, stream_id=STREAM_ANY):
         """
-        seek to the given frame number in the stream.
+        seek to the keyframe preceding the given frame number,
+        in presentation order, in the stream, using the index of
+        the Demuxer. Returns the timestamp of the frame, to be given
+        to Decoder.decode_to() to get it (see decode_at()).
         """
         self._ensure_ready()
-        if stream_id != STREAM_ANY:
-            self._ensure_stream_id(stream_id)
-            warnings.warn("seek interface is still experimental."
-                          "Likely broken if stream_id != STREAM_ANY",
-                          RuntimeWarning)
-        raise NotImplementedError
+        if stream_id == STREAM_ANY:
+            raise errors.ProcessingError("seek_frame needs a stream id")
+        self._ensure_stream_id(stream_id)
+        if self.index is None:
+            raise errors.ProcessingError("no index available")
+        tstamp = self.index.frame_ts(stream_id, frameno)
+        self.seek_keyframe(tstamp, stream_id)
+        return tstamp
+
+    def decode_at(self, decoder, stream_id, frameno=None, tstamp=None):
+        """
+        frame-accurate seek: returns the frame of the stream with
+        the given frame number or at (or just after) the given
+        timestamp, decoded by the given Decoder. Needs the index.
+        Following decoder.decode(dmx.stream(stream_id)) calls return
+        the next frames.
+        """
+        if frameno is not None:
+            tstamp = self.seek_frame(frameno, stream_id)
+        elif tstamp is not None:
+            self.seek_keyframe(tstamp, stream_id)
+        else:
+            raise errors.ProcessingError("missing frame number or timestamp")
+        return decoder.decode_to(self.stream(stream_id), tstamp)
 
     def seek_ts(self, tstamp, stream_id=STREAM_ANY):
         """
@@ -320,6 +460,71 @@ class Demuxer(object):
                   % (tstamp, strerror(err))
             raise errors.ProcessingError(msg)
 
+    def seek_keyframe(self, tstamp, stream_id):
+        """
+        seek to the last keyframe at or before the given timestamp,
+        in the stream time base, using the index of the Demuxer.
+        Returns the timestamp of the keyframe.
+        """
+        ffh = self._ff
+        self._ensure_ready()
+        self._ensure_stream_id(stream_id)
+        if self.index is None:
+            raise errors.ProcessingError("no index available")
+        key_ts, pos = self.index.keyframe(stream_id, tstamp)
+        # libavformat seeks by dts, and a keyframe may have dts < pts
+        # (e.g. B-frames): seek backward to the dts of the keyframe,
+        # or a forward seek to its pts could land on the next one.
+        key_dts = self.index.keyframe_dts(stream_id, tstamp)
+        err = ffh.lavf.avformat_seek_file(self._pctx[0], stream_id,
+                                          _TS_MIN, key_dts, key_dts, 0)
+        if err < 0 and pos >= 0:
+            err = ffh.lavf.avformat_seek_file(self._pctx[0], stream_id,
+                                              pos, pos, pos,
+                                              SeekFlags.AVSEEK_FLAG_BYTE)
+        if err < 0:
+            msg = "seek to keyframe %i failed (error=%s)" \
+                  % (key_ts, strerror(err))
+            raise errors.ProcessingError(msg)
+        return key_ts
+
+    def want_stream(self, stream_id):
+        """
+        marks the stream as wanted. Once any stream is wanted, the
+        packets of all the other streams are discarded by libavformat
+        itself, and never reach the Demuxer, not even using STREAM_ANY.
+        stream() and open_decoder() do this automatically.
+        """
+        self._ensure_ready()
+        self._ensure_stream_id(stream_id)
+        if stream_id not in self._wanted:
+            self._wanted.add(stream_id)
+            _set_discard(self._pctx[0], self._wanted)
+
+    def reset_streams(self):
+        """
+        marks all the streams as wanted again: undoes want_stream().
+        """
+        self._ensure_ready()
+        self._wanted.clear()
+        _set_discard(self._pctx[0], self._wanted)
+
+    @property
+    def readahead(self):
+        """
+        the iobridge.ReadAhead feeding the demuxer, None if there is
+        none. Exposes the watermarks and the stalls, throttles and peak
+        counters, to tune the read-ahead.
+        """
+        return self._readahead
+
+    @property
+    def wanted_streams(self):
+        """
+        the ids of the wanted streams. Empty means all of them.
+        """
+        return frozenset(self._wanted)
+
     def read_frame(self, stream_id=STREAM_ANY):
         """
         reads and returns a new complete encoded frame (enclosed in a Packet)
@@ -334,18 +539,52 @@ class Demuxer(object):
         self._ensure_ready()
         if stream_id != STREAM_ANY:
             self._ensure_stream_id(stream_id)
-        return _read_frame(self._ff, self._pctx[0], _new_cpkt, stream_id)
+        return _read_frame(self._ff, self._pctx[0], self._new_pkt,
+                           stream_id, self._pool)
 
-    def open_decoder(self, stream_id):
+    def read_frames(self, count, stream_id=STREAM_ANY):
+        """
+        reads up to `count' new complete encoded frames in one go,
+        and returns them packed in a PacketBatch.
+        Much faster than read_frame() for packet-level processing.
+        if the optional `stream_id' argument is !ANY, returns frames
+        belonging to the specified streams.
+        The batch holds less than `count' frames only if the
+        stream ends, or if reading fails midway: the packets already
+        read are returned anyway, and the error is raised by the
+        following call.
+
+        raises EndOfStreamError if the stream is already ended.
+        """
+        self._ensure_ready()
+        if stream_id != STREAM_ANY:
+            self._ensure_stream_id(stream_id)
+        if self._read_error is not None:
+            err, self._read_error = self._read_error, None
+            raise err
+        batch = _read_frames(self._ff, self._pctx[0], self._new_pkt,
+                             stream_id, count, self._pool)
+        self._read_error = batch.error
+        return batch
+
+    def open_decoder(self, stream_id, params=None):
         """
         create and returns a full-blown decoder Instance capable
         to decode the selected stream.
         Like doing things manually, just easily.
+        The optional `params' are applied to the decoder before
+        to open it; use them e.g. to set up multithreaded decoding:
+        {'threads': 4, 'thread_type': video.ThreadType.FRAME}
+        or to trade quality for speed (video only):
+        {'speed_tier': video.SpeedTier.FAST}
+        The stream is marked as wanted (see want_stream()).
         """
         self._ensure_ready()
         self._ensure_stream_id(stream_id)  # STREAM_ANY is not valid here
+        self.want_stream(stream_id)
         ctx = self._pctx[0].streams[stream_id].codec
-        return make_codec(video.Decoder, audio.Decoder, stream_id, ctx)
+        return make_codec(video.Decoder, audio.Decoder, stream_id, ctx,
+                          params)
 
     def _stream_info(self, stream):
         """
@@ -385,14 +624,46 @@ class Demuxer(object):
     def stream(self, sid=STREAM_ANY):
         """
         generator that returns all packets that belong to a
-        specified stream id.
+        specified stream id, which is marked as wanted
+        (see want_stream()).
         """
+        if sid != STREAM_ANY:
+            self.want_stream(sid)
         while True:
             try:
                 yield self.read_frame(sid)
             except errors.EOSError:
-                break
-        raise StopIteration
+                return
+
+    def keyframes(self, sid, interval=None):
+        """
+        generator that returns only the keyframe packets of the given
+        stream, to be fed into a decoder in keyframes_only mode.
+        If `interval' (in the stream time base) is given, returns
+        at most one keyframe for each interval; if the Demuxer has
+        an index, it seeks over the packets in between, rather than
+        reading them.
+        """
+        target = None
+        for pkt in self.stream(sid):
+            if not pkt.is_key:
+                continue
+            tstamp = pkt.pts if pkt.pts != TS_NULL else pkt.dts
+            if target is not None and tstamp < target:
+                continue
+            yield pkt
+            if interval is None or tstamp == TS_NULL:
+                continue
+            target = tstamp + interval
+            if self.index is not None:
+                try:
+                    key_ts, _ = self.index.keyframe(sid, target)
+                except errors.ProcessingError:
+                    continue
+                if key_ts > tstamp:
+                    # just skips the packets in between: the next
+                    # keyframe must still be at or after target.
+                    self.seek_keyframe(target, sid)
 
     @property
     def streams(self):
@@ -416,13 +687,31 @@ class Muxer(object):
     If the file format is_seekable but the file-like doesn't support
     seek, expect weird things.
     """
-    def __init__(self, sink, name=None, streaming=True):
+    def __init__(self, sink, name=None, streaming=True, bufsize=IO_BUF_SIZE,
+                 coalesce=0):
         """
         Muxer(sink, name="")
         Initialize a new muxer for the file type `name';
         Use "" (empty) for detect it from the `sink` name attribute
         A Muxer needs a RawIOBase-compliant as a sink of data.
         The RawIOBase-compliant object must be already open.
+        `bufsize' is the size in bytes of the I/O buffer: larger
+        buffers mean fewer writes to `sink'.
+        If `coalesce' is nonzero, the data is handed to `sink' in
+        chunks of (at least) that many bytes, and flushed once
+        the trailer is written.
+        """
+        self._setup(sink.name, name)
+        if coalesce:
+            sink = CoalescingSink(sink, coalesce)
+            self._coalescer = sink
+        self._sink = iosink(sink, streaming, bufsize)
+        self._pctx[0].pb = self._sink.avio
+        self._pctx[0].flags |= FormatFlags.AVFMT_FLAG_CUSTOM_IO
+
+    def _setup(self, sink_name, name):
+        """
+        sets up the state shared by all the Muxer flavours.
         """
         self._ff = ff.get_handle()
         ffh = self._ff  # shortcut
@@ -433,8 +722,11 @@ class Muxer(object):
         # to act as junction.
         self._tb_q = _time_base_q(ffh)
         self._streams = []
-        self._sink = iosink(sink, streaming)
-        sink_name = bytes(sink.name.encode('utf-8'))
+        self._sink = None
+        self._coalescer = None
+        self._has_header = False
+        self._ready = False
+        sink_name = to_path_bytes(sink_name)
         err = ffh.lavf.avformat_alloc_output_context2(self._pctx,
                                                       ffh.ffi.NULL,
                                                       ffh.ffi.NULL,
@@ -447,15 +739,43 @@ class Muxer(object):
                                                           sink_name)
         if self._pctx[0] == ffh.ffi.NULL:
             raise errors.SetupError("open error=%i" % err)
-
-        self._pctx[0].pb = self._sink.avio
-        self._pctx[0].flags |= FormatFlags.AVFMT_FLAG_CUSTOM_IO
-        self._has_header = False
         self._ready = True
 
+    @classmethod
+    def to_path(cls, path, name=None):
+        """
+        builds a Muxer which writes the file at `path' by itself,
+        without any Python code in the I/O loop.
+        Prefer this over a file-like for local files.
+        `path' can be text, bytes or a path-like object.
+        """
+        mux = object.__new__(cls)
+        mux._setup(path, name)
+        ffh = mux._ff  # shortcut
+        if not mux._pctx[0].oformat.flags & AVFmtFlags.NOFILE:
+            ppb = ffh.ffi.new('AVIOContext **')
+            err = ffh.lavf.avio_open(ppb, to_path_bytes(path),
+                                     AVIO_FLAG_WRITE)
+            if err < 0:
+                raise errors.SetupError("open error=%i" % err)
+            mux._pctx[0].pb = ppb[0]
+        return mux
+
     def __del__(self):
         # TODO: free stream
-        pass
+        self._close_io()
+
+    def _close_io(self):
+        """
+        closes the output file, if it was opened by the Muxer itself.
+        """
+        # __init__ may have failed before setting any of them.
+        pctx = getattr(self, '_pctx', None)
+        sink = getattr(self, '_sink', None)
+        if sink is None and pctx is not None and \
+           pctx[0] != self._ff.ffi.NULL and pctx[0].pb != self._ff.ffi.NULL:
+            self._ff.lavf.avio_close(pctx[0].pb)
+            pctx[0].pb = self._ff.ffi.NULL
 
     def _ensure_ready(self):
         """
@@ -519,6 +839,10 @@ class Muxer(object):
         err = ffh.lavf.av_write_trailer(self._pctx[0])
         _check_write(err, "trailer")
         self._ready = False
+        self._close_io()
+        if self._coalescer is not None:
+            ffh.lavf.avio_flush(self._pctx[0].pb)
+            self._coalescer.flush()
 
     def write_frame(self, packet):
         """
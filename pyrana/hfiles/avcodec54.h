@@ -156,6 +156,12 @@ typedef struct AVCodec {
     enum AVMediaType type;
     enum AVCodecID id;
     int capabilities;
+    const AVRational *supported_framerates;
+    const enum AVPixelFormat *pix_fmts;
+    const int *supported_samplerates;
+    const enum AVSampleFormat *sample_fmts;
+    const uint64_t *channel_layouts;
+    uint8_t max_lowres;
     /* ... */
 } AVCodec;
 AVCodec *av_codec_next(const AVCodec *c);
@@ -172,6 +178,7 @@ int av_codec_is_decoder(const AVCodec *codec);
 
 int avcodec_open2(AVCodecContext *avctx, const AVCodec *codec, AVDictionary **options);
 int avcodec_close(AVCodecContext *avctx);
+void avcodec_flush_buffers(AVCodecContext *avctx);
 
 AVFrame *avcodec_alloc_frame(void);
 void avcodec_get_frame_defaults(AVFrame *frame);
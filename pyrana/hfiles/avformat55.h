@@ -24,8 +24,14 @@ typedef struct AVOutputFormat {
 } AVOutputFormat;
 AVInputFormat *av_iformat_next(AVInputFormat *F);
 AVOutputFormat *av_oformat_next(AVOutputFormat *F);
+AVInputFormat *av_find_input_format(const char *short_name);
 
-typedef struct AVIOContext AVIOContext;
+typedef struct AVIOContext {
+    const AVClass *av_class;
+    unsigned char *buffer;
+    int buffer_size;
+    /* ... */
+} AVIOContext;
 AVIOContext *avio_alloc_context(
        unsigned char *buffer,
        int buffer_size,
@@ -35,6 +41,9 @@ AVIOContext *avio_alloc_context(
        int (*write_packet)(void *opaque, uint8_t *buf, int buf_size),
        int64_t (*seek)(void *opaque, int64_t offset, int whence));
 int url_feof(AVIOContext *s);
+int avio_open(AVIOContext **s, const char *url, int flags);
+int avio_close(AVIOContext *s);
+void avio_flush(AVIOContext *s);
 
 typedef struct AVStream {
     int index;
@@ -91,6 +91,10 @@ int av_image_get_buffer_size(enum AVPixelFormat pix_fmt,
 int av_image_alloc(uint8_t *pointers[4], int linesizes[4],
                    int w, int h, enum AVPixelFormat pix_fmt, int align);
 
+void av_image_copy_plane(uint8_t *dst, int dst_linesize,
+                         const uint8_t *src, int src_linesize,
+                         int bytewidth, int height);
+
 /* mathematics.h */
 int64_t av_rescale(int64_t a, int64_t b, int64_t c);
 int64_t av_rescale_rnd(int64_t a, int64_t b, int64_t c, enum AVRounding);
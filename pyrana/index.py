@@ -0,0 +1,264 @@
+"""
+This module provides the packet index support code,
+used by the Demuxer to seek exactly on keyframes.
+For internal usage only: do not use nor import directly.
+"""
+
+from array import array
+from bisect import bisect_right
+import os
+import os.path
+import struct
+import sys
+from .packet import PacketFlags, TS_NULL
+from . import errors
+
+
+INDEX_MAGIC = b'PYRANAIX'
+INDEX_VERSION = 1
+# magic, version, source size, source mtime (nsecs), number of entries
+_HEADER = struct.Struct('<8sIqqQ')
+# typecode, item size of each of the per-packet arrays, in file order.
+_ARRAYS = (('stream_ids', 'i', 4), ('pts', 'q', 8), ('dts', 'q', 8),
+           ('pos', 'q', 8), ('flags', 'B', 1))
+
+
+def sidecar_path(path):
+    """
+    the path of the index sidecar file for the given media file,
+    of the same type (text or bytes) of the given one.
+    """
+    fspath = getattr(os, 'fspath', None)
+    if fspath is not None:
+        path = fspath(path)
+    return path + (b'.pyridx' if isinstance(path, bytes) else '.pyridx')
+
+
+def _signature(path):
+    """
+    what identifies the content of a file for the index.
+    """
+    st = os.stat(path)
+    return st.st_size, getattr(st, 'st_mtime_ns', int(st.st_mtime * 1e9))
+
+
+def _replace(src, dst):
+    """
+    renames `src' to `dst', overwriting `dst' if it exists.
+    os.rename does not overwrite on Windows, and os.replace
+    is not available before python 3.3.
+    """
+    replace = getattr(os, 'replace', None)
+    if replace is not None:
+        replace(src, dst)
+        return
+    if os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
+
+
+def _key_ts(pts, dts):
+    """
+    the timestamp of a packet, for the index.
+    """
+    return pts if pts != TS_NULL else dts
+
+
+class KeyframeIndex(object):
+    """
+    index of all the packets of a media file: for each packet,
+    in demuxing order, records stream id, pts, dts, byte position
+    and flags. Build it once with scan(), then save() it as compact
+    binary sidecar to be load()ed later, or just use from_path().
+    Timestamps are in the time base of the packet stream.
+    """
+    def __init__(self):
+        self.stream_ids = array('i')
+        self.pts = array('q')
+        self.dts = array('q')
+        self.pos = array('q')
+        self.flags = array('B')
+        self._streams = {}  # per-stream lookup tables, built on demand
+
+    def __repr__(self):
+        return "KeyframeIndex(packets=%i)" % len(self)
+
+    def __len__(self):
+        return len(self.stream_ids)
+
+    def add(self, stream_id, pts, dts, pos, is_key):
+        """
+        adds a new packet at the end of the index.
+        """
+        self.stream_ids.append(stream_id)
+        self.pts.append(pts)
+        self.dts.append(dts)
+        self.pos.append(pos)
+        self.flags.append(PacketFlags.AV_PKT_FLAG_KEY if is_key else 0)
+        self._streams.clear()
+
+    @classmethod
+    def scan(cls, dmx):
+        """
+        builds the index reading all the packets from a Demuxer,
+        which is consumed.
+        """
+        idx = cls()
+        try:
+            while True:
+                pkt = dmx.read_frame()
+                idx.add(pkt.stream_id, pkt.pts, pkt.dts, pkt.pos, pkt.is_key)
+        except errors.EOSError:
+            pass
+        return idx
+
+    @classmethod
+    def from_path(cls, path, save=True):
+        """
+        loads the index of the media file at `path' from its sidecar,
+        or scans the file if the sidecar is missing or stale, and
+        (optionally) saves the sidecar.
+        """
+        from .formats import Demuxer  # avoid circular imports
+        side = sidecar_path(path)
+        try:
+            return cls.load(side, path)
+        except (IOError, OSError, errors.ProcessingError):
+            pass  # go ahead and build it.
+        idx = cls.scan(Demuxer.from_path(path))
+        if save:
+            try:
+                idx.save(side, path)
+            except (IOError, OSError):
+                pass  # the sidecar is just an optimization
+        return idx
+
+    def save(self, side, path):
+        """
+        stores the index of the media file at `path'
+        into the sidecar file `side'.
+        """
+        size, mtime = _signature(path)
+        tmp = side + (b'.tmp' if isinstance(side, bytes) else '.tmp')
+        with open(tmp, 'wb') as dst:
+            dst.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION,
+                                   size, mtime, len(self)))
+            for name, _, _ in _ARRAYS:
+                arr = getattr(self, name)
+                if sys.byteorder == 'big':
+                    arr = array(arr.typecode, arr)
+                    arr.byteswap()
+                arr.tofile(dst)
+        _replace(tmp, side)
+
+    @classmethod
+    def load(cls, side, path):
+        """
+        loads the index of the media file at `path'
+        from the sidecar file `side'.
+        raises ProcessingError if the sidecar is stale or damaged.
+        """
+        with open(side, 'rb') as src:
+            header = src.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise errors.ProcessingError("truncated index")
+            magic, vers, size, mtime, count = _HEADER.unpack(header)
+            if magic != INDEX_MAGIC or vers != INDEX_VERSION:
+                raise errors.ProcessingError("unsupported index")
+            if (size, mtime) != _signature(path):
+                raise errors.ProcessingError("stale index")
+            idx = cls()
+            for name, code, itemsize in _ARRAYS:
+                arr = array(code)
+                if arr.itemsize != itemsize:
+                    raise errors.ProcessingError("unsupported platform")
+                try:
+                    arr.fromfile(src, count)
+                except EOFError:
+                    raise errors.ProcessingError("truncated index")
+                if sys.byteorder == 'big':
+                    arr.byteswap()
+                setattr(idx, name, arr)
+        return idx
+
+    def is_key(self, num):
+        """
+        boolean flag. Is the num-th packet a key frame?
+        """
+        return bool(self.flags[num] & PacketFlags.AV_PKT_FLAG_KEY)
+
+    def _stream(self, stream_id):
+        """
+        the (cached) lookup tables for the given stream: the sorted
+        timestamps of all the packets, and the sorted timestamps,
+        positions and decoding timestamps of the keyframes.
+        """
+        tables = self._streams.get(stream_id)
+        if tables is None:
+            frames, keys = [], []
+            for num in range(len(self)):
+                if self.stream_ids[num] != stream_id:
+                    continue
+                tstamp = _key_ts(self.pts[num], self.dts[num])
+                if tstamp == TS_NULL:
+                    continue
+                frames.append(tstamp)
+                if self.is_key(num):
+                    dts = self.dts[num]
+                    keys.append((tstamp, self.pos[num],
+                                 dts if dts != TS_NULL else tstamp))
+            frames.sort()
+            keys.sort()
+            tables = (frames,
+                      [tstamp for tstamp, _, _ in keys],
+                      [pos for _, pos, _ in keys],
+                      [dts for _, _, dts in keys])
+            self._streams[stream_id] = tables
+        return tables
+
+    def frame_count(self, stream_id):
+        """
+        the number of (timestamped) frames in the given stream.
+        """
+        return len(self._stream(stream_id)[0])
+
+    def frame_ts(self, stream_id, frameno):
+        """
+        the timestamp of the frameno-th frame, in presentation order,
+        of the given stream.
+        """
+        frames = self._stream(stream_id)[0]
+        if not 0 <= frameno < len(frames):
+            msg = "frame %i not in [0,%i)" % (frameno, len(frames))
+            raise errors.ProcessingError(msg)
+        return frames[frameno]
+
+    def keyframe(self, stream_id, tstamp):
+        """
+        finds the last keyframe of the given stream at or before
+        the given timestamp. Returns its (timestamp, byte position).
+        """
+        _, keys, poss, _ = self._stream(stream_id)
+        num = self._keyframe_num(keys, stream_id, tstamp)
+        return keys[num], poss[num]
+
+    def keyframe_dts(self, stream_id, tstamp):
+        """
+        like keyframe(), but returns the decoding timestamp of the
+        keyframe (its timestamp if it has none): this is what
+        libavformat looks for when seeking.
+        """
+        _, keys, _, dtss = self._stream(stream_id)
+        return dtss[self._keyframe_num(keys, stream_id, tstamp)]
+
+    @staticmethod
+    def _keyframe_num(keys, stream_id, tstamp):
+        """
+        the position in `keys' of the last keyframe at or before
+        the given timestamp.
+        """
+        num = bisect_right(keys, tstamp) - 1
+        if num < 0:
+            msg = "no keyframe before %i in stream %i" % (tstamp, stream_id)
+            raise errors.ProcessingError(msg)
+        return num
@@ -3,11 +3,28 @@ I/O glue code between Python and the FFMpeg libraries.
 This module is not part of the pyrana public API.
 """
 
+import mmap
+import os
+import stat
+import threading
+from collections import deque
 from .packet import PKT_SIZE
-from .errors import UnsupportedError
+from .errors import SetupError, UnsupportedError
 from . import ff
 
 
+# large enough to make the C->Python callbacks rare
+# when reading (or writing) regular files.
+IO_BUF_SIZE = 256 * 1024
+
+
+def _aligned_size(size):
+    """
+    rounds up the size to a multiple of PKT_SIZE.
+    """
+    return max(PKT_SIZE, ((size + PKT_SIZE - 1) // PKT_SIZE) * PKT_SIZE)
+
+
 class Buffer(object):
     """
     Wrapper class for a buffer properly aligned for
@@ -87,39 +104,375 @@ AVSEEK_SIZE = 0x10000
 AVSEEK_FORCE = 0x20000
 
 
+def _stream_size(src):
+    """
+    find the size in bytes of a file-like, looking first
+    at the underlying file (if any), then seeking to its end.
+    Returns -1 if the size cannot be known.
+    """
+    try:
+        st = os.fstat(src.fileno())
+        if stat.S_ISREG(st.st_mode):
+            return st.st_size
+    except (AttributeError, OSError, ValueError):
+        pass  # not backed by a regular file. Try harder.
+    try:
+        pos = src.tell()
+        size = src.seek(0, os.SEEK_END)
+        src.seek(pos, os.SEEK_SET)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return -1
+
+
 def _seek(handle, offset, whence):
     """
     libavformat seek callback. Actually: wrapper. Do not use directly.
     """
-    if whence == AVSEEK_SIZE:
-        return -1  # unsupported, yet
     ffh = ff.get_handle()
     src = ffh.ffi.from_handle(handle)
-    ret = src.seek(offset, whence)
+    if whence == AVSEEK_SIZE:
+        return _stream_size(src)
+    ret = src.seek(offset, whence & ~AVSEEK_FORCE)
     return ret
 
 
+def _make_seek(size_hint):
+    """
+    builds a seek callback which reports the given size.
+    """
+    def _seek_hinted(handle, offset, whence):
+        """
+        libavformat seek callback. Actually: wrapper. Do not use directly.
+        """
+        if whence == AVSEEK_SIZE:
+            return size_hint
+        return _seek(handle, offset, whence)
+    return _seek_hinted
+
+
+class MemorySource(object):
+    """
+    read-only source of data backed by an object supporting
+    the buffer protocol, like bytes, bytearray, memoryview or mmap.
+    The IOBridge callbacks copy straight from the buffer,
+    without calling back any Python method.
+    """
+    def __init__(self, data):
+        self._ff = ff.get_handle()
+        self._data = data  # keep it alive while in use
+        self.cdata = self._ff.ffi.from_buffer(data)
+        self.size = len(self.cdata)
+        self.pos = 0
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return "MemorySource(size=%i, pos=%i)" % (self.size, self.pos)
+
+
+def _is_memory(source):
+    """
+    can the source be used as a MemorySource?
+    """
+    return isinstance(source, (bytes, bytearray, memoryview, mmap.mmap))
+
+
+def _mem_read(handle, buf, buf_size):
+    """
+    libavformat read callback for MemorySources.
+    Actually: wrapper. Do not use directly.
+    """
+    ffh = ff.get_handle()
+    src = ffh.ffi.from_handle(handle)
+    size = min(buf_size, src.size - src.pos)
+    if size <= 0:
+        return 0
+    ffh.ffi.memmove(buf, src.cdata + src.pos, size)
+    src.pos += size
+    return size
+
+
+def _mem_seek(handle, offset, whence):
+    """
+    libavformat seek callback for MemorySources.
+    Actually: wrapper. Do not use directly.
+    """
+    ffh = ff.get_handle()
+    src = ffh.ffi.from_handle(handle)
+    if whence == AVSEEK_SIZE:
+        return src.size
+    whence &= ~AVSEEK_FORCE
+    if whence == os.SEEK_SET:
+        pos = offset
+    elif whence == os.SEEK_CUR:
+        pos = src.pos + offset
+    elif whence == os.SEEK_END:
+        pos = src.size + offset
+    else:
+        return -1
+    if pos < 0 or pos > src.size:
+        return -1
+    src.pos = pos
+    return pos
+
+
+class ReadAhead(object):
+    """
+    read-ahead wrapper over a (slow) file-like source, like a pipe
+    or a network-backed file. A worker thread fills a bounded buffer
+    reading from the source, while the consumer drains it through
+    readinto(). The worker pauses once the buffered data reaches
+    the `high' watermark, and resumes once it falls down to the `low'
+    watermark. Being a streaming source, it does not support seek().
+    Counters:
+    stalls: how many times the consumer had to wait for data.
+    throttles: how many times the worker paused on the high watermark.
+    peak: the maximum amount of data (bytes) ever buffered.
+    """
+    def __init__(self, src, high=4 * IO_BUF_SIZE, low=IO_BUF_SIZE,
+                 chunk_size=IO_BUF_SIZE):
+        if not 0 <= low < high:
+            raise SetupError("bad watermarks: low=%i high=%i" % (low, high))
+        self._src = src
+        self._chunk_size = chunk_size
+        self.high_watermark = high
+        self.low_watermark = low
+        self.stalls = 0
+        self.throttles = 0
+        self.peak = 0
+        self._chunks = deque()
+        self._offset = 0  # in the first chunk
+        self._buffered = 0
+        self._eof = False
+        self._err = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._fill,
+                                        name="pyrana-readahead")
+        self._worker.daemon = True
+        self._worker.start()
+
+    def __repr__(self):
+        return "ReadAhead(buffered=%i, stalls=%i, throttles=%i)" % (
+            self._buffered, self.stalls, self.throttles)
+
+    @property
+    def buffered(self):
+        """
+        amount of data (bytes) read from the source
+        and not yet consumed.
+        """
+        return self._buffered
+
+    def _wait_room(self):
+        """
+        waits, if needed, until the buffer is drained down to
+        the low watermark. Returns False if closed meanwhile.
+        Must be called with the condition held.
+        """
+        if self._buffered >= self.high_watermark:
+            self.throttles += 1
+            while self._buffered > self.low_watermark and not self._closed:
+                self._cond.wait()
+        return not self._closed
+
+    def _fill(self):
+        """
+        the worker thread body.
+        """
+        while True:
+            with self._cond:
+                if not self._wait_room():
+                    return
+            try:
+                data = self._src.read(self._chunk_size)
+            except Exception as exc:  # pylint: disable=W0703
+                data, err = None, exc
+            else:
+                err = None
+            with self._cond:
+                if data:
+                    self._chunks.append(data)
+                    self._buffered += len(data)
+                    self.peak = max(self.peak, self._buffered)
+                else:
+                    self._eof = True
+                    self._err = err
+                self._cond.notify_all()
+            if not data:
+                return
+
+    def readable(self):
+        """
+        ReadAhead is always readable.
+        """
+        return True
+
+    def seekable(self):
+        """
+        ReadAhead is never seekable.
+        """
+        return False
+
+    def readinto(self, buf):
+        """
+        fills `buf' with the read-ahead data, waiting for some
+        if none is available. Returns 0 on end of stream.
+        """
+        with self._cond:
+            if not self._chunks and not self._eof:
+                self.stalls += 1
+                while not self._chunks and not self._eof:
+                    self._cond.wait()
+            if self._err is not None and not self._chunks:
+                raise self._err
+            pos, size = 0, len(buf)
+            while pos < size and self._chunks:
+                chunk = self._chunks[0]
+                num = min(size - pos, len(chunk) - self._offset)
+                buf[pos:pos + num] = chunk[self._offset:self._offset + num]
+                pos += num
+                self._offset += num
+                if self._offset == len(chunk):
+                    self._chunks.popleft()
+                    self._offset = 0
+            self._buffered -= pos
+            if self._buffered <= self.low_watermark:
+                self._cond.notify_all()
+            return pos
+
+    def close(self):
+        """
+        stops the worker thread and drops the buffered data.
+        Does not close the source.
+        """
+        with self._cond:
+            self._closed = True
+            self._eof = True
+            self._chunks.clear()
+            self._buffered = 0
+            self._cond.notify_all()
+
+
+class CoalescingSink(object):
+    """
+    write-coalescing wrapper over a file-like sink.
+    The data written is gathered in memory, and handed over to
+    the sink in chunks of at least `threshold' bytes, to keep the
+    write rate low when the data comes in small pieces.
+    Call flush() to write out the pending data.
+    Counters:
+    writes: how many times data was written into the wrapper.
+    flushes: how many times data was written into the sink.
+    """
+    def __init__(self, sink, threshold=4 * IO_BUF_SIZE):
+        self._sink = sink
+        self._pending = bytearray()
+        self.threshold = threshold
+        self.writes = 0
+        self.flushes = 0
+
+    def __repr__(self):
+        return "CoalescingSink(threshold=%i, pending=%i)" % (
+            self.threshold, len(self._pending))
+
+    @property
+    def name(self):
+        """
+        the name of the sink.
+        """
+        return self._sink.name
+
+    @property
+    def pending(self):
+        """
+        amount of data (bytes) not yet written into the sink.
+        """
+        return len(self._pending)
+
+    def writable(self):
+        """
+        CoalescingSink is always writable.
+        """
+        return True
+
+    def write(self, data):
+        """
+        gathers the data, and writes out if the threshold is reached.
+        """
+        self._pending.extend(data)
+        self.writes += 1
+        if len(self._pending) >= self.threshold:
+            self._write_out()
+        return len(data)
+
+    def _write_out(self):
+        """
+        writes all the pending data into the sink.
+        """
+        if self._pending:
+            self._sink.write(self._pending)
+            self._pending = bytearray()
+            self.flushes += 1
+
+    def flush(self):
+        """
+        writes all the pending data into the sink, and flushes it.
+        """
+        self._write_out()
+        if hasattr(self._sink, 'flush'):
+            self._sink.flush()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """
+        writes out the pending data, then seeks the sink.
+        """
+        self._write_out()
+        return self._sink.seek(offset, whence)
+
+    def tell(self):
+        """
+        the position of the sink, pending data included.
+        """
+        return self._sink.tell() + len(self._pending)
+
+
 class IOBridge(object):
     """
     wraps the avio handling.
     A separate classe is advisable because
-    1. you need to handle a Buffer for I/O and take good care of it.
+    1. you need to handle a buffer for I/O and take good care of it.
     2. you need o propelry av_free the avio once done
     which is enough (it is?) to build a class.
+    The buffer size is rounded up to a multiple of PKT_SIZE;
+    each callback moves at most that many bytes.
+    The size of seekable sources is reported to libavformat;
+    use `size_hint' when it cannot be found from the file-like.
     """
     def __init__(self, fh, readwrite=True, seekable=True,
-                 bufsize=PKT_SIZE, delay_open=False):
+                 bufsize=IO_BUF_SIZE, delay_open=False, size_hint=None):
         self._ff = ff.get_handle()
         ffi = self._ff.ffi
         self._rw = readwrite
         self._fh = fh
+        self._handle = ffi.new_handle(fh)  # must outlive the avio
+        self._bufsize = _aligned_size(bufsize)
         self.avio = ffi.NULL
-        self._buf = Buffer(bufsize)
-        read = ffi.callback("int(void *, uint8_t *, int)", _read)
+        memsrc = isinstance(fh, MemorySource)
+        read = ffi.callback("int(void *, uint8_t *, int)",
+                            _mem_read if memsrc else _read)
         write = ffi.callback("int(void *, uint8_t *, int)", _write)
         seek = ffi.NULL
         if seekable:
-            seek = ffi.callback("int64_t(void *, int64_t, int)", _seek)
+            if memsrc:
+                seek_cb = _mem_seek
+            elif size_hint is not None:
+                seek_cb = _make_seek(size_hint)
+            else:
+                seek_cb = _seek
+            seek = ffi.callback("int64_t(void *, int64_t, int)", seek_cb)
         self._refs = (read, write, seek)  # ensure the callbacks are ref'd
         if not delay_open:
             self.open()
@@ -128,7 +481,8 @@ class IOBridge(object):
         self.close()
 
     def __repr__(self):
-        return "IOBridge(src=None, seekable=%i)" % (self.seekable)
+        return "IOBridge(src=None, seekable=%i, bufsize=%i)" % (
+            self.seekable, self._bufsize)
 
     def _alloc_buf(self, size):
         """
@@ -142,6 +496,13 @@ class IOBridge(object):
         self._ff = ff.get_handle()
         return self._ff.lavu.av_malloc(size)
 
+    @property
+    def bufsize(self):
+        """
+        size (bytes) of the buffer used by the avio.
+        """
+        return self._bufsize
+
     @property
     def seekable(self):
         """
@@ -155,10 +516,11 @@ class IOBridge(object):
         """
         ffi = self._ff.ffi
         read, write, seek = self._refs
-        self.avio = self._ff.lavf.avio_alloc_context(self._alloc_buf(PKT_SIZE),
-                                                     PKT_SIZE,
+        size = self._bufsize
+        self.avio = self._ff.lavf.avio_alloc_context(self._alloc_buf(size),
+                                                     size,
                                                      int(self._rw),
-                                                     ffi.new_handle(self._fh),
+                                                     self._handle,
                                                      read,
                                                      write,
                                                      seek)
@@ -167,7 +529,10 @@ class IOBridge(object):
         """
         close (really: deallocate) the underlying avio
         """
-        self._ff.lavu.av_free(self.avio)
+        if self.avio != self._ff.ffi.NULL:
+            # the avio may have replaced the buffer we gave it.
+            self._ff.lavu.av_free(self.avio.buffer)
+            self._ff.lavu.av_free(self.avio)
         self.avio = self._ff.ffi.NULL
 
 
@@ -178,16 +543,22 @@ def _seekable(streamable):
     return not streamable
 
 
-def iosource(source, streaming, bufsize=PKT_SIZE, delay_open=False):
+def iosource(source, streaming, bufsize=IO_BUF_SIZE, delay_open=False,
+             size_hint=None):
     """
     convenience function.
     builds an IOBridge suitable as source of data.
+    bytes, bytearray, memoryview and mmap sources
+    are read through a MemorySource.
     """
+    if _is_memory(source):
+        source = MemorySource(source)
     return IOBridge(source, readwrite=False, seekable=_seekable(streaming),
-                    bufsize=bufsize, delay_open=delay_open)
+                    bufsize=bufsize, delay_open=delay_open,
+                    size_hint=size_hint)
 
 
-def iosink(sink, streaming, bufsize=PKT_SIZE, delay_open=False):
+def iosink(sink, streaming, bufsize=IO_BUF_SIZE, delay_open=False):
     """
     convenience function.
     builds an IOBridge suitable as sink for data.
@@ -3,9 +3,10 @@ This module provides the transport layer Packet support code.
 For internal usage only: do not use nor import directly.
 """
 
+from array import array
 from contextlib import contextmanager
 from enum import IntEnum
-from .common import PY3
+from .common import PY3, cdata_view
 from . import ff, errors
 
 
@@ -15,6 +16,8 @@ from . import ff, errors
 # promotions. Sometimes the two things mismatch.
 TS_NULL = -0x8000000000000000
 PKT_SIZE = 4096
+# memoryview.toreadonly() is new in python 3.8
+_ZERO_COPY_VIEW = hasattr(memoryview, 'toreadonly')
 
 
 # see avcodec for the meaning of flags
@@ -27,11 +30,10 @@ class PacketFlags(IntEnum):
     AV_PKT_FLAG_CORRUPT = 0x0002
 
 
-def _new_cpkt(ffh, size):
+def _init_cpkt(ffh, pkt, size):
     """
-    builds a new C(ffi) packet of the given size.
+    initializes a C(ffi) packet with a payload of the given size.
     """
-    pkt = ffh.ffi.new('AVPacket *')
     if size == 0:
         ffh.lavc.av_init_packet(pkt)
         pkt.data = ffh.ffi.NULL
@@ -43,6 +45,65 @@ def _new_cpkt(ffh, size):
     return pkt
 
 
+def _new_cpkt(ffh, size):
+    """
+    builds a new C(ffi) packet of the given size.
+    """
+    return _init_cpkt(ffh, ffh.ffi.new('AVPacket *'), size)
+
+
+class PacketPool(object):
+    """
+    a bounded pool of pre-allocated C(ffi) packets, recycled
+    when the Packets built around them are released, in order
+    to keep the memory churn flat in long-running processes.
+    Give one to a Demuxer to make it reuse the packets.
+    """
+    def __init__(self, size=64):
+        self._ff = ff.get_handle()
+        self._size = size
+        self._free = [self._ff.ffi.new('AVPacket *') for _ in range(size)]
+        self.allocated = 0  # packets allocated because the pool was empty
+        self.recycled = 0  # packets given back to the pool
+
+    def __repr__(self):
+        return "PacketPool(size=%i, free=%i)" % (self._size, len(self))
+
+    def __len__(self):
+        return len(self._free)
+
+    @property
+    def size(self):
+        """
+        the maximum number of packets held by the pool.
+        """
+        return self._size
+
+    def new_cpkt(self, ffh, size):
+        """
+        like _new_cpkt, but reuses a pooled C(ffi) packet if available.
+        """
+        try:
+            pkt = self._free.pop()
+        except IndexError:
+            pkt = ffh.ffi.new('AVPacket *')
+            self.allocated += 1
+        try:
+            return _init_cpkt(ffh, pkt, size)
+        except errors.PyranaError:
+            self.release(pkt)
+            raise
+
+    def release(self, pkt):
+        """
+        gives back to the pool a C(ffi) packet, whose payload
+        must have been already freed.
+        """
+        if len(self._free) < self._size:
+            self._free.append(pkt)
+            self.recycled += 1
+
+
 @contextmanager
 def bind_packet(ffh, size=0):
     """
@@ -74,7 +135,10 @@ class Packet(object):
     """
     a Packet object represents an immutable, encoded packet of a
     multimedia stream.
+    Use view() to inspect the payload without copying it.
     """
+    __slots__ = ('_ff', '_pkt', '_raw_data', '_pool', '_hash')
+
     def __init__(self, stream_id=None,
                  data=None, pts=TS_NULL, dts=TS_NULL, is_key=False):
         self._ff = ff.get_handle()
@@ -86,6 +150,8 @@ class Packet(object):
             size = len(data)
 
         self._pkt = _new_cpkt(self._ff, size)
+        self._pool = None
+        self._hash = None
 
         if stream_id is not None:
             self._pkt.stream_index = stream_id
@@ -98,11 +164,13 @@ class Packet(object):
             self._raw_data[0:self._pkt.size] = data
 
     @classmethod
-    def from_cdata(cls, cpkt):
+    def from_cdata(cls, cpkt, pool=None):
         """
         builds a pyrana Packet from (around) a (cffi-wrapped) libav*
         packet object.
         The libav object must be already initialized and ready to go.
+        If a PacketPool is given, the libav object is given back to it
+        once this Packet is released.
         WARNING: raw access. Use with care.
         """
         ffh = ff.get_handle()
@@ -110,10 +178,14 @@ class Packet(object):
         setattr(pkt, '_ff', ffh)
         setattr(pkt, '_pkt', cpkt)
         setattr(pkt, '_raw_data', ffh.ffi.buffer(cpkt.data, cpkt.size))
+        setattr(pkt, '_pool', pool)
+        setattr(pkt, '_hash', None)
         return pkt
 
     def __del__(self):
         self._ff.lavc.av_free_packet(self._pkt)
+        if self._pool is not None:
+            self._pool.release(self._pkt)
 
     def __repr__(self):
         return "Packet(stream_id=%i, size=%i, " \
@@ -125,12 +197,12 @@ class Packet(object):
         return self.size
 
     def __getitem__(self, key):
-        dat = bytes(self)
-        return dat[key]
+        dat = self._data_view()[key]
+        return dat.tobytes() if isinstance(key, slice) else dat
 
     def blob(self):
         """returns the bytes() dump of the object"""
-        return bytes(self.data)
+        return self._data_view().tobytes()
 
     def __bytes__(self):
         return self.blob()
@@ -139,10 +211,34 @@ class Packet(object):
         return repr(self) if PY3 else self.blob()
 
     def __eq__(self, other):
-        return self.data == other.data
+        if not isinstance(other, Packet):
+            return NotImplemented
+        return self._data_view() == other._data_view()
 
     def __hash__(self):
-        return hash(self.data)
+        # packets are immutable, so the hash never changes.
+        if self._hash is None:
+            self._hash = hash(self.blob())
+        return self._hash
+
+    def _data_view(self):
+        """
+        memoryview over the packet data, for internal usage only:
+        unlike view(), doesn't keep the packet alive.
+        """
+        return memoryview(self._raw_data)[:self.size]
+
+    def view(self):
+        """
+        read-only memoryview over the packet data.
+        On python >= 3.8 the view is zero-copy, and keeps the packet
+        alive. Older pythons cannot make read-only a view over C memory,
+        so they get a view over a copy of the data.
+        """
+        if not _ZERO_COPY_VIEW:
+            return memoryview(self.data)
+        mview = cdata_view(self._ff.ffi, self._pkt.data, self.size, self)
+        return mview.toreadonly()
 
     @property
     def size(self):
@@ -155,6 +251,7 @@ class Packet(object):
     def data(self):
         """
         the raw data (bytes) this packet carries.
+        This is a copy: use view() to avoid it.
         """
         return self._raw_data[:self.size]
 
@@ -179,6 +276,13 @@ class Packet(object):
         """
         return self._pkt.dts
 
+    @property
+    def pos(self):
+        """
+        the byte position of this packet in the source, -1 if unknown.
+        """
+        return self._pkt.pos
+
     @property
     def is_key(self):
         """
@@ -200,3 +304,67 @@ class Packet(object):
         yield self._pkt
         self._pkt.data = orig_data
         self._pkt.size = orig_size
+
+
+class PacketBatch(object):
+    """
+    a PacketBatch represents a sequence of immutable, encoded packets
+    read in one go (see Demuxer.read_frames), in a compact form:
+    the packet attributes are stored in parallel arrays, and all the
+    payloads are stored back to back in one contiguous data arena.
+    If reading failed before the batch was full, `error' holds
+    the exception.
+    """
+    def __init__(self):
+        self.stream_ids = array('i')
+        self.pts = array('q')
+        self.dts = array('q')
+        self.flags = array('i')
+        self.sizes = array('i')
+        self.offsets = array('q')  # of each payload into the data arena
+        self.data = bytearray()
+        self.error = None
+
+    def __repr__(self):
+        return "PacketBatch(packets=%i, size=%i)" \
+               % (len(self), len(self.data))
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __getitem__(self, idx):
+        """
+        builds a stand-alone Packet (thus a copy) of the idx-th item.
+        """
+        return Packet(self.stream_ids[idx], self.payload(idx),
+                      self.pts[idx], self.dts[idx], self.is_key(idx))
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def append(self, stream_id, pts, dts, flags, payload):
+        """
+        adds a new packet at the end of the batch.
+        `payload' can be any object supporting the buffer protocol.
+        """
+        self.stream_ids.append(stream_id)
+        self.pts.append(pts)
+        self.dts.append(dts)
+        self.flags.append(flags)
+        self.offsets.append(len(self.data))
+        self.data += payload
+        self.sizes.append(len(self.data) - self.offsets[-1])
+
+    def payload(self, idx):
+        """
+        zero-copy access to the data carried by the idx-th packet.
+        """
+        off = self.offsets[idx]
+        return memoryview(self.data)[off:off+self.sizes[idx]]
+
+    def is_key(self, idx):
+        """
+        boolean flag. Is the idx-th packet a key frame?
+        """
+        return bool(self.flags[idx] & PacketFlags.AV_PKT_FLAG_KEY)
@@ -4,12 +4,19 @@ Encoders, Decoders and their support code.
 """
 
 from enum import IntEnum
-from .common import to_pixel_format, to_picture_type
+from .common import to_pixel_format, to_picture_type, cdata_view
+from .common import handle_cache
 from .codec import BaseFrame, BaseDecoder, BaseEncoder, bind_frame
 from .codec import Payload, make_payload, wire_decoder, wire_encoder
 from .codec import _new_av_frame_pp
-from .errors import ProcessingError, SetupError
+from .codec import ThreadType  # pylint: disable=W0611
+from .codec import Discard
+from .errors import ProcessingError, SetupError, UnsupportedError
 from . import ff
+try:
+    import numpy
+except ImportError:
+    numpy = None
 # the following is just to export to the clients the Enums.
 # pylint: disable=W0611
 from .ffenums import PixelFormat, PictureType
@@ -17,9 +24,12 @@ from .ffenums import PixelFormat, PictureType
 
 InputCodec = None  # to be filled in setup()
 OutputCodec = None  # to be filled in setup()
+DecoderCodec = None  # to be filled in setup(): the decoders only
+EncoderCodec = None  # to be filled in setup(): the encoders only
 
 
 NUM_PLANES = 8
+SWS_CACHE_SIZE = 8  # SWScale contexts kept around for reuse.
 
 
 class SWSMode(IntEnum):
@@ -42,6 +52,49 @@ class SWSMode(IntEnum):
     SWS_SPLINE = 0x400
 
 
+class SpeedTier(IntEnum):
+    """
+    decoding quality/speed tradeoffs, from the full quality down
+    to rough previews. Use it as the `speed_tier' decoder parameter.
+    Not all the codecs honour all the settings of a tier.
+    """
+    FULL = 0  # full quality
+    FAST = 1  # no deblocking of the non-reference frames
+    FASTER = 2  # no deblocking at all, half resolution
+    FASTEST = 3  # no IDCT of the non-reference frames, quarter resolution
+
+
+# codec context settings for each SpeedTier.
+# lowres is clamped to the maximum supported by the codec.
+_SPEED_TIERS = {
+    SpeedTier.FULL: {},
+    SpeedTier.FAST: {'skip_loop_filter': Discard.NONREF},
+    SpeedTier.FASTER: {'skip_loop_filter': Discard.ALL,
+                       'lowres': 1},
+    SpeedTier.FASTEST: {'skip_loop_filter': Discard.ALL,
+                        'skip_idct': Discard.NONREF,
+                        'lowres': 2},
+}
+
+
+def _speed_params(ffh, codec, params):
+    """
+    expands the `speed_tier' of the decoder `params', if any,
+    in the codec context settings, for the given AVCodec.
+    The settings given explicitly in `params' take precedence.
+    """
+    if not params or 'speed_tier' not in params:
+        return params
+    params = dict(params)
+    tier = SpeedTier(params.pop('speed_tier'))
+    for name, value in _SPEED_TIERS[tier].items():
+        if name == 'lowres':
+            max_lowres = 0 if codec == ffh.ffi.NULL else codec.max_lowres
+            value = min(value, max_lowres)
+        params.setdefault(name, value)
+    return params
+
+
 def _setup_av_frame_pp(ffh, ppframe, width, height, pixfmt):
     """
     WRITEME
@@ -76,16 +129,27 @@ def _image_from_frame(ffh, parent, cframe, pixfmt):
         raise ProcessingError(msg)
     null = ffh.ffi.NULL
     width, height = cframe.width, cframe.height
-    sws = ffh.sws.sws_getCachedContext(null,
-                                       width, height, cframe.format,
-                                       width, height, pixfmt,
-                                       SWSMode.SWS_BILINEAR,
-                                       null, null, null)
     # we don't care about the _resizing_ algorithm here, because
     # we will NOT do any resizing.
-    if not sws:
-        msg = "cannot get a SWScale context"
-        raise ProcessingError(msg)
+    flags = SWSMode.SWS_BILINEAR
+
+    def _new_sws():
+        """
+        builds a brand new SWScale context for this conversion.
+        """
+        sws = ffh.sws.sws_getCachedContext(null,
+                                           width, height, cframe.format,
+                                           width, height, pixfmt,
+                                           flags, null, null, null)
+        if not sws:
+            msg = "cannot get a SWScale context"
+            raise ProcessingError(msg)
+        return sws
+
+    scalers = handle_cache(ffh, '_sws_cache',
+                           ffh.sws.sws_freeContext, SWS_CACHE_SIZE)
+    sws = scalers.get((cframe.format, pixfmt, width, height, flags),
+                      _new_sws)
     with bind_frame(ffh) as ppframe:
         _setup_av_frame_pp(ffh, ppframe, width, height, pixfmt)
 
@@ -99,25 +163,23 @@ def _image_from_frame(ffh, parent, cframe, pixfmt):
         return Image.from_cdata(ppframe, sws, parent)
 
 
-def _plane_copy(pixels, plane,
+def _plane_pack(ffh, pixels, plane,
                 dst_linesize, src_linesize,
-                bwidth, height,
-                dst=0):
+                bwidth, height):
     """
     workhorse function. Copy data between two (optionally)
-    strided data planes.
+    strided data planes, which are C(ffi) buffers, moving the whole
+    plane with just one call into libavutil, at memcpy speed.
     Usually the destination buffer isn't padded, aka
     has stride == width.
+    Returns the number of bytes written in the destination.
     """
     if src_linesize < bwidth or dst_linesize < bwidth:
         raise ProcessingError('bytewidth too small')
-    src = 0
-    while height:
-        pixels[dst:dst+bwidth] = plane[src:src+bwidth]
-        dst += dst_linesize
-        src += src_linesize
-        height -= 1
-    return dst
+    ffh.lavu.av_image_copy_plane(pixels, dst_linesize,
+                                 plane, src_linesize,
+                                 bwidth, height)
+    return dst_linesize * height
 
 
 class Image(Payload):
@@ -170,28 +232,30 @@ class Image(Payload):
         """
         returns the bytes() dump of the object.
         """
-        pixels = bytearray(len(self))
+        ffi = self._ff.ffi
+        size = len(self)
+        pixels = ffi.new('uint8_t[]', size)
         idx, dst = 0, 0
-        while self._ppframe[0].data[idx] != self._ff.ffi.NULL:
-            pixels, dst = self._dump_plane(idx, pixels, dst)
+        while idx < NUM_PLANES and self._ppframe[0].data[idx] != ffi.NULL:
+            dst = self._pack_plane(idx, pixels, dst, size)
             idx += 1
-        return bytes(pixels)
+        return ffi.buffer(pixels, size)[:]
 
-    def _dump_plane(self, idx, pixels=None, dst=0):
+    def _pack_plane(self, idx, pixels, dst, size):
         """
-        Dump (a copy of) a single plane into a (optionally given)
-        bytearray.
+        Pack (a copy of) a single plane, without padding, into the
+        given C(ffi) buffer of `size' bytes, starting at offset `dst'.
+        Returns the offset past the copied data.
         """
         ffh = self._ff
         frm = self._ppframe[0]
         bwidth = ffh.lavu.av_image_get_linesize(frm.format, frm.width, idx)
         height = self._plane_height(idx)
-        pixels = bytearray(bwidth * height) if pixels is None else pixels
-        plane = ffh.ffi.buffer(frm.data[idx], frm.linesize[idx] * height)
-        dst += _plane_copy(pixels, plane,
-                           bwidth, frm.linesize[idx],
-                           bwidth, height, dst)
-        return pixels, dst
+        if bwidth < 0 or dst + bwidth * height > size:
+            raise ProcessingError("cannot pack plane %i" % idx)
+        return dst + _plane_pack(ffh, pixels + dst, frm.data[idx],
+                                 bwidth, frm.linesize[idx],
+                                 bwidth, height)
 
     def _plane_height(self, idx=0):
         """
@@ -205,15 +269,65 @@ class Image(Payload):
             height = frm.height >> desc.log2_chroma_h
         return height
 
-    def plane(self, idx):
+    def _ensure_plane(self, idx):
         """
-        Read-only byte access to a single plane of the Image.
+        ensures the given plane index is valid for this Image.
         """
         if idx < 0 or idx >= NUM_PLANES or \
            self._ppframe[0].data[idx] == self._ff.ffi.NULL:
             raise ProcessingError("bad plane %i" % idx)
-        pixels, _ = self._dump_plane(idx)
-        return bytes(pixels)
+
+    def _plane_buffer(self, idx):
+        """
+        zero-copy, flat access to the (padded) data of a single plane.
+        """
+        frm = self._ppframe[0]
+        size = frm.linesize[idx] * self._plane_height(idx)
+        return cdata_view(self._ff.ffi, frm.data[idx], size, self)
+
+    def plane(self, idx):
+        """
+        Read-only byte access to a single plane of the Image.
+        """
+        self._ensure_plane(idx)
+        ffh = self._ff
+        frm = self._ppframe[0]
+        size = ffh.lavu.av_image_get_linesize(frm.format, frm.width, idx) \
+            * self._plane_height(idx)
+        pixels = ffh.ffi.new('uint8_t[]', max(size, 1))
+        self._pack_plane(idx, pixels, 0, size)
+        return ffh.ffi.buffer(pixels, size)[:]
+
+    def plane_view(self, idx):
+        """
+        Zero-copy, read-write access to a single plane of the Image.
+        Returns a two-dimensional memoryview of (height, linesize) bytes;
+        rows are padded to the plane linesize, so the row stride is
+        exactly the one used by libav*.
+        The view keeps this Image (and thus the parent Frame) alive.
+        """
+        self._ensure_plane(idx)
+        frm = self._ppframe[0]
+        return self._plane_buffer(idx).cast('B', (self._plane_height(idx),
+                                                  frm.linesize[idx]))
+
+    def as_array(self, idx=0):
+        """
+        Zero-copy access to a single plane of the Image as NumPy array.
+        Returns a (height, bytewidth) uint8 array whose row stride is
+        the plane linesize, thus the padding is not exposed.
+        The array keeps this Image (and thus the parent Frame) alive.
+        Requires NumPy.
+        """
+        if numpy is None:
+            raise UnsupportedError("NumPy is not available")
+        self._ensure_plane(idx)
+        frm = self._ppframe[0]
+        bwidth = self._ff.lavu.av_image_get_linesize(frm.format,
+                                                     frm.width, idx)
+        pixels = numpy.frombuffer(self._plane_buffer(idx), dtype=numpy.uint8)
+        pixels = pixels.reshape(self._plane_height(idx), frm.linesize[idx])
+        return pixels[:, :bwidth]
 
     @property
     def is_shared(self):
@@ -362,6 +476,8 @@ def fill_yuv420p(frame, i):
 class Decoder(BaseDecoder):
     """
     Decodes video Packets into video Frames.
+    Besides the codec context fields, accepts the `speed_tier'
+    parameter (see SpeedTier).
     """
     @staticmethod
     def wire(dec):
@@ -375,18 +491,27 @@ class Decoder(BaseDecoder):
                             "video")
 
     def __init__(self, input_codec, params=None):
+        if params and isinstance(input_codec, str):
+            ffh = ff.get_handle()
+            codec = ffh.lavc.avcodec_find_decoder_by_name(
+                input_codec.encode('utf-8'))
+            params = _speed_params(ffh, codec, params)
         super(Decoder, self).__init__(input_codec, params)
         self.wire(self)
 
     @classmethod
-    def from_cdata(cls, ctx):
+    def from_cdata(cls, ctx, params=None):
         """
         builds a pyrana Video Decoder from (around) a (cffi-wrapped) libav*
         (video)decoder object.
         The libav object must be already initialized and ready to go.
         WARNING: raw access. Use with care.
         """
-        return cls.wire(BaseDecoder.from_cdata(ctx))
+        if params:
+            ffh = ff.get_handle()
+            codec = ffh.lavc.avcodec_find_decoder(ctx.codec_id)
+            params = _speed_params(ffh, codec, params)
+        return cls.wire(BaseDecoder.from_cdata(ctx, params))
 
 
 class Encoder(BaseEncoder):
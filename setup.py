@@ -1,5 +1,7 @@
 import os.path
+import sys
 from distutils.core import setup
+from distutils.command.build_py import build_py
 
 
 def version():
@@ -22,6 +24,29 @@ powerful handling of multimedia files, using the FFmpeg libraries
 under the hood.
 """
 
+class build_py_ffi(build_py):
+    """
+    also precompiles the FFI module for the installed FFmpeg libraries
+    (see tools/build_ffi.py). Skipped if they, or cffi, are missing:
+    pyrana falls back to parse the hfiles at runtime.
+    """
+    def run(self):
+        build_py.run(self)
+        sys.path.insert(0, 'tools')
+        try:
+            import build_ffi
+            from pyrana.ff import HLoader, versions
+            hfiles = HLoader(versions()).hfiles
+        except Exception as exc:
+            self.warn("skipping the FFI module: %s" % exc)
+            return
+        finally:
+            sys.path.pop(0)
+        if not self.dry_run:
+            self.announce("building %s" % build_ffi.build(hfiles,
+                                                          self.build_lib))
+
+
 setup(name='pymedia2-pyrana',
       version=version(),
       description='Package for simple manipulation of multimedia files',
@@ -33,6 +58,7 @@ setup(name='pymedia2-pyrana',
       url='http://bitbucket.org/mojaves/pyrana',
       download_url='http://bitbucket.org/mojaves/pyrana',
       packages=[ 'pyrana' ],
+      cmdclass={'build_py': build_py_ffi},
       package_data={'pyrana': ['hfiles/*.*']},
       install_requires=[
         "cffi>=0.7.2",
@@ -6,15 +6,16 @@ import time
 import hashlib
 import pyrana.formats
 import pyrana.errors
+from pyrana.video import ThreadType, SpeedTier
 
 pyrana.setup()
 
 
-def extract_stream(src, ctx, sid=pyrana.formats.STREAM_ANY):
+def extract_stream(src, ctx, sid=pyrana.formats.STREAM_ANY, params=None):
     try:
         cnt = 0
         dmx = pyrana.formats.Demuxer(src)
-        vdec = dmx.open_decoder(sid)
+        vdec = dmx.open_decoder(sid, params)
 
         while True:
             frame = vdec.decode(dmx.stream(sid))
@@ -31,25 +32,101 @@ def extract_stream(src, ctx, sid=pyrana.formats.STREAM_ANY):
         return cnt
 
 
-def _main(fname, sid):
+def _run(fname, sid, params=None):
     ctx = hashlib.sha256()
     start = time.time()
     with open(fname, "rb") as fin:
-        num = extract_stream(fin, ctx, sid)
+        num = extract_stream(fin, ctx, sid, params)
     elapsed = time.time() - start
-    print("%i frames, %.3fs, %.3f fps: stream %s = %s" % (
-            num, elapsed, num/elapsed, sid, ctx.hexdigest()))
+    return num, elapsed, ctx.hexdigest()
+
+
+def _pack(fname, sid, frames=500):
+    # throughput of Image.blob() vs a plain memcpy of the same size.
+    packed, copied, total = 0.0, 0.0, 0
+    with open(fname, "rb") as fin:
+        dmx = pyrana.formats.Demuxer(fin)
+        vdec = dmx.open_decoder(sid)
+        try:
+            for _ in range(frames):
+                img = vdec.decode(dmx.stream(sid)).image()
+                start = time.time()
+                data = img.blob()
+                packed += time.time() - start
+                ref = bytearray(len(data))
+                start = time.time()
+                bytes(ref)
+                copied += time.time() - start
+                total += len(data)
+        except pyrana.errors.EOSError:
+            pass
+    mbytes = total / float(1024 * 1024)
+    print("Image.blob(): %.1f MiB in %.3fs, %.1f MiB/s" % (
+          mbytes, packed, mbytes / packed))
+    print("memcpy:       %.1f MiB in %.3fs, %.1f MiB/s (blob at %.0f%%)" % (
+          mbytes, copied, mbytes / copied, 100 * copied / packed))
+
+
+def _tiers(fname, sid, threads=0, thread_type=ThreadType.FRAME):
+    # fps for each quality/speed tier, from the full quality down.
+    base = None
+    for tier in SpeedTier:
+        params = {'speed_tier': tier}
+        if threads:
+            params.update({'threads': threads, 'thread_type': thread_type})
+        num, elapsed, digest = _run(fname, sid, params)
+        fps = num/elapsed
+        base = fps if base is None else base
+        print("%8s tier: %i frames, %.3fs, %.3f fps (x%.2f):"
+              " stream %s = %s" % (
+                tier.name.lower(), num, elapsed, fps,
+                fps/base, sid, digest))
+
+
+def _main(fname, sid, max_threads=0, thread_type=ThreadType.FRAME):
+    if not max_threads:
+        num, elapsed, digest = _run(fname, sid)
+        print("%i frames, %.3fs, %.3f fps: stream %s = %s" % (
+                num, elapsed, num/elapsed, sid, digest))
+        return
+    # fps scaling with the thread count: 1, 2, 4... max_threads
+    threads, base = 1, None
+    while threads <= max_threads:
+        params = {'threads': threads, 'thread_type': thread_type}
+        num, elapsed, digest = _run(fname, sid, params)
+        fps = num/elapsed
+        base = fps if base is None else base
+        print("%2i %s threads: %i frames, %.3fs, %.3f fps (x%.2f):"
+              " stream %s = %s" % (
+                threads, thread_type.name.lower(), num, elapsed, fps,
+                fps/base, sid, digest))
+        threads *= 2
 
 
 if __name__ == "__main__":
     sid = pyrana.formats.STREAM_ANY
+    max_threads = 0
+    thread_type = ThreadType.FRAME
     args = sys.argv[1:]
+    mode = args.pop(0) if args and args[0] in ('--tiers', '--pack') \
+        else None
     if len(args) == 1:
         src = args[0]
     elif len(args) >= 2:
         src = args[0]
         sid = int(args[1])
+        if len(args) >= 3:
+            max_threads = int(args[2])
+        if len(args) >= 4:
+            thread_type = ThreadType[args[3].upper()]
     else:
-        sys.stderr.write("usage: %s source_file [stream_id]\n" % sys.argv[0])
+        sys.stderr.write("usage: %s [--tiers|--pack] source_file [stream_id"
+                         " [max_threads [frame|slice]]]\n" % sys.argv[0])
         sys.exit(1)
-    _main(src, sid)
+    if mode == '--tiers':
+        # here max_threads is the fixed thread count for all the tiers.
+        _tiers(src, sid, max_threads, thread_type)
+    elif mode == '--pack':
+        _pack(src, sid)
+    else:
+        _main(src, sid, max_threads, thread_type)
@@ -26,11 +26,32 @@ def extract_stream(src, ctx, sid=pyrana.formats.STREAM_ANY):
         return cnt
 
 
-def _main(fname, sid):
+def extract_stream_batch(src, ctx, sid=pyrana.formats.STREAM_ANY,
+                         batch_size=256):
+    try:
+        cnt = 0
+        dmx = pyrana.formats.Demuxer(src)
+        while True:
+            batch = dmx.read_frames(batch_size, sid)
+            for idx in range(len(batch)):
+                w = ctx.update(batch.payload(idx))
+            cnt += len(batch)
+    except pyrana.errors.EOSError:
+        pass
+    except pyrana.errors.PyranaError as err:
+        sys.stderr.write("%s\n" % err)
+    finally:
+        return cnt
+
+
+def _main(fname, sid, batch_size=0):
     ctx = hashlib.sha256()
     start = time.time()
     with open(fname, "rb") as fin:
-        num = extract_stream(fin, ctx, sid)
+        if batch_size > 0:
+            num = extract_stream_batch(fin, ctx, sid, batch_size)
+        else:
+            num = extract_stream(fin, ctx, sid)
     elapsed = time.time() - start
     print("%i pkts, %.3fs, %.3f pps: stream %s = %s" % (
             num, elapsed, num/elapsed, sid, ctx.hexdigest()))
@@ -38,13 +59,17 @@ def _main(fname, sid):
 
 if __name__ == "__main__":
     sid = pyrana.formats.STREAM_ANY
+    batch_size = 0
     args = sys.argv[1:]
     if len(args) == 1:
         src = args[0]
     elif len(args) >= 2:
         src = args[0]
         sid = int(args[1])
+        if len(args) >= 3:
+            batch_size = int(args[2])
     else:
-        sys.stderr.write("usage: %s source_file [stream_id]\n" % sys.argv[0])
+        sys.stderr.write("usage: %s source_file [stream_id [batch_size]]\n"
+                         % sys.argv[0])
         sys.exit(1)
-    _main(src, sid)
+    _main(src, sid, batch_size)
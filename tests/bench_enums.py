@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+
+import sys
+import time
+import pyrana.common
+from pyrana.common import to_enum_value
+from pyrana.ffenums import PixelFormat, SampleFormat, PictureType
+
+
+def uncached(ival, enum_class, fallback, starter=-1):
+    # what to_enum_value did before the lookup tables were cached.
+    rmap = dict(enumerate(enum_class, starter))
+    return rmap.get(ival, fallback)
+
+
+def bench(conv, enum_class, rounds):
+    fallback = list(enum_class)[0]
+    vals = [ival % len(enum_class) for ival in range(rounds)]
+    start = time.time()
+    for ival in vals:
+        conv(ival, enum_class, fallback)
+    return time.time() - start
+
+
+def _main(rounds):
+    # three property accesses per video frame: a pixel format,
+    # a picture type and (for the audio side) a sample format.
+    for enum_class in (PixelFormat, SampleFormat, PictureType):
+        for name, conv in (("uncached", uncached),
+                           ("cached", to_enum_value)):
+            elapsed = bench(conv, enum_class, rounds)
+            print("%12s %8s: %7i lookups, %.3fs, %.3f us/lookup" % (
+                  enum_class.__name__, name, rounds, elapsed,
+                  elapsed * 1e6 / rounds))
+    start = time.time()
+    for ival in range(rounds):
+        pyrana.common.to_pixel_format(ival & 0x3F)
+        pyrana.common.to_picture_type(ival & 0x07)
+    elapsed = time.time() - start
+    print("per-frame properties: %.3f us/frame" % (elapsed * 1e6 / rounds))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        sys.stderr.write("usage: %s [rounds]\n" % sys.argv[0])
+        sys.exit(1)
+    _main(int(sys.argv[1]) if len(sys.argv) == 2 else 100000)
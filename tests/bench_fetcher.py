@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+
+import sys
+import time
+from collections import deque
+import pyrana.formats
+import pyrana.errors
+
+pyrana.setup()
+
+
+def read_packets(src, sid, limit):
+    dmx = pyrana.formats.Demuxer(src)
+    pkts = []
+    try:
+        while len(pkts) < limit:
+            pkts.append(dmx.read_frame(sid))
+    except pyrana.errors.EOSError:
+        pass
+    return dmx, pkts
+
+
+def decode_all(vdec, seq):
+    cnt = 0
+    try:
+        while True:
+            vdec.decode(seq)
+            cnt += 1
+    except pyrana.errors.EOSError:
+        pass
+    return cnt
+
+
+def _main(fname, sid, limit):
+    # the decoding time per packet is expected to stay flat
+    # as the number of packets grows, with both lists and deques.
+    num = 1000
+    while num <= limit:
+        with open(fname, "rb") as fin:
+            dmx, pkts = read_packets(fin, sid, num)
+        for kind, seq in (("list", list(pkts)), ("deque", deque(pkts))):
+            vdec = dmx.open_decoder(sid)
+            start = time.time()
+            cnt = decode_all(vdec, seq)
+            elapsed = time.time() - start
+            print("%6s: %6i pkts, %6i frames, %.3fs, %.3f us/pkt" % (
+                  kind, len(pkts), cnt, elapsed,
+                  elapsed * 1e6 / max(len(pkts), 1)))
+        if len(pkts) < num:
+            break  # no more packets to read
+        num *= 2
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) >= 2:
+        src = args[0]
+        sid = int(args[1])
+        limit = int(args[2]) if len(args) >= 3 else 16000
+    else:
+        sys.stderr.write("usage: %s source_file stream_id [max_packets]\n"
+                         % sys.argv[0])
+        sys.exit(1)
+    _main(src, sid, limit)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+
+import io
+import os
+import sys
+import time
+import pyrana.formats
+import pyrana.errors
+
+pyrana.setup()
+
+
+class CountingReader(io.FileIO):
+    """counts the read callbacks done by the IOBridge."""
+    def __init__(self, name):
+        super(CountingReader, self).__init__(name, 'rb')
+        self.reads = 0
+        self.seeks = 0
+
+    def readinto(self, buf):
+        self.reads += 1
+        return super(CountingReader, self).readinto(buf)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self.seeks += 1
+        return super(CountingReader, self).seek(offset, whence)
+
+
+def demux_all(src, bufsize):
+    cnt = 0
+    dmx = pyrana.formats.Demuxer(src, bufsize=bufsize)
+    try:
+        while True:
+            dmx.read_frame()
+            cnt += 1
+    except pyrana.errors.EOSError:
+        pass
+    return cnt
+
+
+def _main(fname, sizes):
+    size_mb = os.path.getsize(fname) / float(1024 * 1024)
+    for bufsize in sizes:
+        with CountingReader(fname) as src:
+            start = time.time()
+            num = demux_all(src, bufsize)
+            elapsed = time.time() - start
+        print("bufsize=%8i: %6i pkts, %6i reads, %5i seeks, %.3fs, %.3f MiB/s"
+              % (bufsize, num, src.reads, src.seeks, elapsed,
+                 size_mb / elapsed))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.stderr.write("usage: %s source_file [bufsize...]\n"
+                         % sys.argv[0])
+        sys.exit(1)
+    _main(sys.argv[1],
+          [int(arg) for arg in sys.argv[2:]] or
+          [4096, 32 * 1024, 256 * 1024, 1024 * 1024])
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+
+import io
+import sys
+import time
+import tempfile
+import pyrana.formats
+import pyrana.packet
+import pyrana.errors
+import pyrana.audio
+from pyrana.audio import SampleFormat, ChannelLayout
+
+pyrana.setup()
+
+
+class CountingWriter(io.FileIO):
+    """counts the writes reaching the output file."""
+    def __init__(self, name):
+        super(CountingWriter, self).__init__(name, 'wb')
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super(CountingWriter, self).write(data)
+
+
+def mux_packets(dst, pkts, coalesce, bufsize):
+    params = {
+        'bit_rate': 64000,
+        'sample_rate': 22050,
+        'channel_layout': ChannelLayout.AV_CH_LAYOUT_STEREO,
+        'sample_fmt': SampleFormat.AV_SAMPLE_FMT_S16
+    }
+    mux = pyrana.formats.Muxer(dst, name='matroska',
+                               coalesce=coalesce, bufsize=bufsize)
+    mux.open_encoder('flac', params)
+    mux.write_header()
+    for pkt in pkts:
+        mux.write_frame(pkt)
+    mux.write_trailer()
+
+
+def make_packets(num, size):
+    pkts = []
+    for idx in range(num):
+        pkt = pyrana.packet.Packet(0, b'\x55' * size, pts=idx, dts=idx)
+        pkts.append(pkt)
+    return pkts
+
+
+def _main(num, size):
+    pkts = make_packets(num, size)
+    mib = num * size / float(1024 * 1024)
+    with tempfile.NamedTemporaryFile(suffix='.mkv') as tmp:
+        for coalesce, bufsize in ((0, 4096), (0, 256 * 1024),
+                                  (1024 * 1024, 4096),
+                                  (1024 * 1024, 256 * 1024)):
+            with CountingWriter(tmp.name) as dst:
+                start = time.time()
+                mux_packets(dst, pkts, coalesce, bufsize)
+                elapsed = time.time() - start
+            print("coalesce=%8i bufsize=%7i: %6i writes, %.3fs, %.3f MiB/s"
+                  % (coalesce, bufsize, dst.writes, elapsed, mib / elapsed))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3:
+        sys.stderr.write("usage: %s [num_packets [packet_size]]\n"
+                         % sys.argv[0])
+        sys.exit(1)
+    _main(int(sys.argv[1]) if len(sys.argv) >= 2 else 10000,
+          int(sys.argv[2]) if len(sys.argv) >= 3 else 256)
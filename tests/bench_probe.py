@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+
+import sys
+import time
+import pyrana.formats
+import pyrana.iobridge
+import pyrana.errors
+
+pyrana.setup()
+
+
+_stream_size = pyrana.iobridge._stream_size
+
+
+def _no_stream_size(src):
+    # how the seek callback behaved before AVSEEK_SIZE was supported.
+    return -1
+
+
+def probe(fname, tstamps, sid):
+    with open(fname, "rb") as fin:
+        start = time.time()
+        dmx = pyrana.formats.Demuxer(fin)  # does find_stream_info
+        opened = time.time()
+        for tstamp in tstamps:
+            dmx.seek_ts(tstamp, sid)
+            dmx.read_frame(sid)
+        done = time.time()
+    return opened - start, (done - opened) / max(len(tstamps), 1)
+
+
+def _main(fname, sid, rounds):
+    tstamps = [(i * 7919) % 1000 for i in range(16)]
+    for name, size_fn in (("no size", _no_stream_size),
+                          ("size", _stream_size)):
+        pyrana.iobridge._stream_size = size_fn
+        open_t, seek_t = 0.0, 0.0
+        for _ in range(rounds):
+            res = probe(fname, tstamps, sid)
+            open_t += res[0]
+            seek_t += res[1]
+        print("%8s: open+find_stream_info %.3f ms, seek_ts+read %.3f ms" % (
+              name, open_t * 1e3 / rounds, seek_t * 1e3 / rounds))
+    pyrana.iobridge._stream_size = _stream_size
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        sys.stderr.write("usage: %s source_file [stream_id [rounds]]\n"
+                         % sys.argv[0])
+        sys.exit(1)
+    _main(args[0],
+          int(args[1]) if len(args) >= 2 else 0,
+          int(args[2]) if len(args) >= 3 else 10)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+
+import sys
+import time
+import random
+import pyrana.formats
+import pyrana.errors
+
+pyrana.setup()
+
+
+def naive_decode_at(dmx, dec, sid, frameno):
+    # seek to the keyframe, then decode everything up to the target.
+    tstamp = dmx.seek_frame(frameno, sid)
+    dec.flush_buffers()
+    while True:
+        frm = dec.decode(dmx.stream(sid))
+        if frm.cdata.pkt_pts >= tstamp:
+            return frm
+
+
+def fast_decode_at(dmx, dec, sid, frameno):
+    return dmx.decode_at(dec, sid, frameno=frameno)
+
+
+def _main(fname, sid, rounds):
+    start = time.time()
+    dmx = pyrana.formats.Demuxer.from_path(fname, index=True)
+    print("index: %i packets, %.3fs" % (len(dmx.index),
+                                         time.time() - start))
+    nframes = dmx.index.frame_count(sid)
+    rng = random.Random(42)
+    targets = [rng.randrange(nframes) for _ in range(rounds)]
+    for name, seek in (("naive", naive_decode_at),
+                       ("decode_at", fast_decode_at)):
+        dec = dmx.open_decoder(sid)
+        start = time.time()
+        for frameno in targets:
+            frm = seek(dmx, dec, sid, frameno)
+            frm.image()  # the conversion for the target frame only
+        elapsed = time.time() - start
+        print("%10s: %4i seeks over %i frames, %.3f ms/seek" % (
+              name, rounds, nframes, elapsed * 1e3 / rounds))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        sys.stderr.write("usage: %s source_file [stream_id [rounds]]\n"
+                         % sys.argv[0])
+        sys.exit(1)
+    _main(args[0],
+          int(args[1]) if len(args) >= 2 else 0,
+          int(args[2]) if len(args) >= 3 else 100)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+
+import sys
+import time
+import subprocess
+
+
+_SETUP = "import pyrana; pyrana.setup(); print(pyrana.ff.FF().precompiled)"
+
+_FIRST_PACKET = """
+import pyrana, pyrana.formats
+pyrana.setup()
+with open(%r, "rb") as src:
+    pyrana.formats.Demuxer(src).read_frame()
+print(pyrana.ff.FF().precompiled)
+"""
+
+
+def startup(code):
+    start = time.time()
+    out = subprocess.check_output([sys.executable, "-W", "ignore",
+                                   "-c", code])
+    return time.time() - start, out.strip() == b"True"
+
+
+def measure(what, code, rounds):
+    # the first run warms up the disk caches.
+    startup(code)
+    times = []
+    for _ in range(rounds):
+        elapsed, precompiled = startup(code)
+        times.append(elapsed)
+    times.sort()
+    print("%12s precompiled=%s: %i runs, min %.1f ms, median %.1f ms" % (
+          what, precompiled, rounds,
+          times[0] * 1e3, times[len(times) // 2] * 1e3))
+
+
+def _main(rounds, fname=None):
+    measure("setup", _SETUP, rounds)
+    if fname is not None:
+        measure("first packet", _FIRST_PACKET % fname, rounds)
+    start = time.time()
+    subprocess.check_call([sys.executable, "-c", "pass"])
+    print("bare interpreter: %.1f ms" % ((time.time() - start) * 1e3))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3:
+        sys.stderr.write("usage: %s [rounds [source_file]]\n" % sys.argv[0])
+        sys.exit(1)
+    _main(int(sys.argv[1]) if len(sys.argv) >= 2 else 20,
+          sys.argv[2] if len(sys.argv) == 3 else None)
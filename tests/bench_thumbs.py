@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+
+import sys
+import time
+import pyrana.formats
+import pyrana.index
+import pyrana.errors
+from pyrana.codec import _frame_ts
+
+pyrana.setup()
+
+
+def _ts(frm):
+    # the timestamps of the packet the frame was decoded from.
+    return _frame_ts(frm.cdata)
+
+
+def thumbs_decode_all(fname, sid, interval):
+    # decode everything, keep one frame each interval.
+    dmx = pyrana.formats.Demuxer.from_path(fname)
+    dec = dmx.open_decoder(sid)
+    thumbs, target = [], None
+    try:
+        while True:
+            frm = dec.decode(dmx.stream(sid))
+            if target is None or _ts(frm) >= target:
+                thumbs.append(frm.image())
+                target = _ts(frm) + interval
+    except pyrana.errors.EOSError:
+        pass
+    return thumbs
+
+
+def thumbs_keyframes(fname, sid, interval, index=False):
+    dmx = pyrana.formats.Demuxer.from_path(fname, index=index)
+    dec = dmx.open_decoder(sid)
+    dec.keyframes_only = True
+    # one generator for all the decode() calls, or each call
+    # would start over, ignoring the interval.
+    keys = dmx.keyframes(sid, interval)
+    thumbs = []
+    try:
+        while True:
+            thumbs.append(dec.decode(keys).image())
+    except pyrana.errors.EOSError:
+        pass
+    return thumbs
+
+
+def _main(fname, sid, seconds):
+    dmx = pyrana.formats.Demuxer.from_path(fname)
+    # StreamInfo.time_base is rounded, too coarse for this.
+    tbase = dmx._pctx[0].streams[sid].time_base
+    interval = int(seconds * tbase.den / tbase.num)
+    pyrana.index.KeyframeIndex.from_path(fname)  # build the sidecar
+    runs = (("decode all", lambda: thumbs_decode_all(fname, sid, interval)),
+            ("keyframes", lambda: thumbs_keyframes(fname, sid, interval)),
+            ("keyframes+index",
+             lambda: thumbs_keyframes(fname, sid, interval, True)))
+    base = None
+    for name, run in runs:
+        start = time.time()
+        thumbs = run()
+        elapsed = time.time() - start
+        base = elapsed if base is None else base
+        print("%16s: %4i thumbnails, %.3fs (x%.2f)" % (
+              name, len(thumbs), elapsed, base / elapsed))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        sys.stderr.write("usage: %s source_file [stream_id [seconds]]\n"
+                         % sys.argv[0])
+        sys.exit(1)
+    _main(args[0],
+          int(args[1]) if len(args) >= 2 else 0,
+          float(args[2]) if len(args) >= 3 else 10.0)
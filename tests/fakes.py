@@ -27,6 +27,7 @@ class Sws:
         self.dst_pix_fmt = None
         self.context_got = 0
         self.scale_done = 0
+        self.context_freed = 0
 
     def sws_isSupportedOutput(self, pixfmt):
         return self.supported
@@ -42,6 +43,9 @@ class Sws:
         self.context_got += 1
         return {'src_pixfmt':src_format, 'dst_pixfmt':dst_format }
 
+    def sws_freeContext(self, ctx):
+        self.context_freed += 1
+
     def sws_scale(self, ctx, data, linesize, flags, height, dst_data, dst_linesize):
         self.scale_done += 1
         return -1 if self.faulty or self.bad_pix_fmt == self.dst_pix_fmt else 0
@@ -56,6 +60,7 @@ class Swr:
         self.ctx_allocs = 0
         self.ctx_inited = 0
         self.conversions = 0
+        self.ctx_freed = 0
 
     def swr_alloc_set_opts(self, ctx,
                            out_ch_layout, out_sample_fmt, out_sample_rate,
@@ -71,6 +76,9 @@ class Swr:
         self.ctx_inited += 1
         return -1 if self.faulty or bad else 0
 
+    def swr_free(self, pctx):
+        self.ctx_freed += 1
+
     def swr_convert(self, ctx,
                     out_data, out_count,
                     in_data , in_count):
@@ -124,6 +132,31 @@ class Lavf:
         return -1
 
 
+class FlakyLavf(Lavf):
+    """reads `good' packets, then fails."""
+    def __init__(self, good):
+        Lavf.__init__(self, faulty=True)
+        self.good = good
+
+    def av_read_frame(self, ctx, pkt):
+        if self.good <= 0:
+            return -1
+        self.good -= 1
+        pkt.stream_index, pkt.pts, pkt.dts, pkt.flags = 0, 1, 1, 0
+        pkt.data, pkt.size = b'abc', 3
+        return 0
+
+
+class Packet:
+    def __init__(self):
+        self.stream_index = 0
+        self.pts = 0
+        self.dts = 0
+        self.flags = 0
+        self.data = b''
+        self.size = 0
+
+
 class Lavu:
     def __init__(self, faulty):
         self.faulty = faulty
@@ -154,6 +187,9 @@ class CFFI:
     def __init__(self):
         self.NULL = None
 
+    def buffer(self, data, size):
+        return data[:size]
+
     def new(self, what):
         class Sink(object):
             def __init__(self):
@@ -176,9 +212,17 @@ class FF:
         self.swr = Swr(faulty)
 
 
+class AVStream:
+    def __init__(self, index):
+        self.index = index
+        self.discard = 0
+
+
 class AVFormatContext:
-    def __init__(self):
+    def __init__(self, nb_streams=0):
         self.pb = None
+        self.nb_streams = nb_streams
+        self.streams = [AVStream(idx) for idx in range(nb_streams)]
 
 
 class AVCodecContext:
@@ -1,6 +1,7 @@
 #!/usr/bin/python
 
 import unittest
+from collections import deque
 from pyrana.common import MediaType, to_media_type
 from pyrana.codec import CodecMixin, BaseDecoder, BaseFrame, Payload
 import pyrana.audio
@@ -137,6 +138,55 @@ class TestBaseDecoder(unittest.TestCase):
         frame = dec.flush()
         assert(frame is ref)
 
+    def test_decode_list_consumed(self):
+        pkts = [pyrana.packet.Packet(0, b"x") for _ in range(3)]
+        ref = list(pkts)
+        dec = BaseDecoder('mjpeg')
+        # one packet, one frame.
+        dec.decode_packet = lambda pkt: iter([pkt])
+        assert([dec.decode(pkts) for _ in range(3)] == ref)
+        assert(len(pkts) == 0)
+        with self.assertRaises(pyrana.errors.EOSError):
+            dec.decode(pkts)
+
+    def test_decode_list_appended(self):
+        pkts = [pyrana.packet.Packet(0, b"x")]
+        dec = BaseDecoder('mjpeg')
+        dec.decode_packet = lambda pkt: iter([pkt])
+        dec.decode(pkts)
+        with self.assertRaises(pyrana.errors.EOSError):
+            dec.decode(pkts)
+        pkts.append(pyrana.packet.Packet(0, b"y"))
+        assert(dec.decode(pkts))
+
+    def test_decode_to_partial_packet(self):
+        class Frame(object):
+            def __init__(self, pts):
+                self.cdata = self  # just the timestamps
+                self.pkt_pts = self.pkt_dts = pts
+        def decode_packet(pkt):
+            yield Frame(10)
+            yield Frame(20)
+            yield Frame(30)
+            raise pyrana.errors.NeedFeedError()
+        dec = BaseDecoder('mjpeg')
+        dec.decode_packet = decode_packet
+        pkts = deque([pyrana.packet.Packet(0, b"x")])
+        assert(dec.decode_to(pkts, 20).cdata.pkt_pts == 20)
+        assert(dec.decode(pkts).cdata.pkt_pts == 30)
+
+    def test_decode_keyframes_only(self):
+        pkts = [pyrana.packet.Packet(0, b"x", is_key=key)
+                for key in (True, False, False, True)]
+        dec = BaseDecoder('mjpeg')
+        dec.decode_packet = lambda pkt: iter([pkt])
+        assert(not dec.keyframes_only)
+        dec.keyframes_only = True
+        assert(dec.keyframes_only)
+        assert([dec.decode(pkts) for _ in range(2)] == [pkts[0], pkts[3]])
+        with self.assertRaises(pyrana.errors.EOSError):
+            dec.decode(pkts)
+
     def test_decode_stop_iteration(self):
         def gen():
             yield pyrana.packet.Packet(0, b"")
@@ -160,8 +210,38 @@ class TestCodecFuncs(unittest.TestCase):
         data = list(range(16))
         fetch = pyrana.codec.make_fetcher(data)
         assert([fetch(), fetch(), fetch()] == [0,1,2])
+        # the fetched items are deleted in batches.
+        assert([fetch() for _ in range(5)] == list(range(3, 8)))
+        assert(list(data) == list(range(8, 16)))
+
+    def test_fetcher_list_appended(self):
+        data = list(range(4))
+        fetch = pyrana.codec.make_fetcher(data)
+        assert([fetch(), fetch()] == [0,1])
+        data.extend(range(4, 8))
+        assert([fetch() for _ in range(6)] == list(range(2, 8)))
+        with self.assertRaises(StopIteration):
+            fetch()
+        assert(data == [])
+
+    def test_fetcher_list_exhausted(self):
+        data = list(range(2))
+        fetch = pyrana.codec.make_fetcher(data)
+        assert([fetch(), fetch()] == [0,1])
+        with self.assertRaises(StopIteration):
+            fetch()
+
+    def test_fetcher_deque(self):
+        data = deque(range(16))
+        fetch = pyrana.codec.make_fetcher(data)
+        assert([fetch(), fetch(), fetch()] == [0,1,2])
         assert(list(data) == list(range(3, 16)))
 
+    def test_fetcher_deque_exhausted(self):
+        fetch = pyrana.codec.make_fetcher(deque())
+        with self.assertRaises(StopIteration):
+            fetch()
+
     def test_fetcher_gen(self):
         def gen(N):
             i = 0
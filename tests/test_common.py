@@ -1,12 +1,20 @@
 #!/usr/bin/python
 
+import gc
+import os
 import os.path
+import threading
 from contextlib import contextmanager
 import unittest
 import pyrana.ff
 import pyrana.errors
 import pyrana.packet
 from pyrana.common import blob, get_field_int, AttrDict, strerror
+from pyrana.common import ContextCache, LazyEnum, handle_cache
+from pyrana.common import to_path_bytes
+from pyrana.common import enum_rmap, to_enum_value
+from pyrana.common import to_pixel_format, to_media_type, MediaType
+from pyrana.ffenums import PixelFormat
 from tests import fakes
 
 
@@ -94,9 +102,159 @@ class TestAttrDict(unittest.TestCase):
         assert(self.atd['ans'] == 42)
 
 
+class TestPathBytes(unittest.TestCase):
+    def test_text(self):
+        assert(to_path_bytes(u'caf\u00e9.ogg') == b'caf\xc3\xa9.ogg')
+
+    def test_bytes(self):
+        assert(to_path_bytes(b'\xff.ogg') == b'\xff.ogg')
+
+    @unittest.skipIf(not hasattr(os, 'fspath'), "requires path-like objects")
+    def test_pathlike(self):
+        import pathlib
+        assert(to_path_bytes(pathlib.PurePosixPath('a/b.ogg')) == b'a/b.ogg')
+
+
+class TestContextCache(unittest.TestCase):
+    def setUp(self):
+        self.freed = []
+        self.cache = ContextCache(self.freed.append, 2)
+
+    def test_creation(self):
+        assert(len(self.cache) == 0)
+        assert(self.cache.capacity == 2)
+
+    def test_make_once(self):
+        made = []
+        def make():
+            made.append('ctx')
+            return 'ctx'
+        assert(self.cache.get('a', make) == 'ctx')
+        assert(self.cache.get('a', make) == 'ctx')
+        assert(made == ['ctx'])
+        assert('a' in self.cache)
+
+    def test_evict_lru(self):
+        self.cache.get('a', lambda: 'A')
+        self.cache.get('b', lambda: 'B')
+        self.cache.get('a', lambda: 'X')  # refresh
+        self.cache.get('c', lambda: 'C')
+        assert(self.freed == ['B'])
+        assert('a' in self.cache and 'c' in self.cache)
+
+    def test_make_fails(self):
+        def make():
+            raise pyrana.errors.ProcessingError()
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            self.cache.get('a', make)
+        assert(len(self.cache) == 0)
+
+    def test_clear(self):
+        self.cache.get('a', lambda: 'A')
+        self.cache.get('b', lambda: 'B')
+        self.cache.clear()
+        assert(len(self.cache) == 0)
+        assert(sorted(self.freed) == ['A', 'B'])
+    def test_del_frees(self):
+        self.cache.get('a', lambda: 'A')
+        del self.cache
+        assert(self.freed == ['A'])
+
+
+class TestHandleCache(unittest.TestCase):
+    def setUp(self):
+        self.ffh = fakes.FF(faulty=False)
+        self.freed = []
+
+    def _cache(self):
+        return handle_cache(self.ffh, '_test_cache', self.freed.append, 2)
+
+    def test_same_thread(self):
+        assert(self._cache() is self._cache())
+
+    def test_per_thread(self):
+        caches = []
+        def run():
+            caches.append(self._cache())
+            caches[-1].get('a', lambda: 'A')
+        thr = threading.Thread(target=run)
+        thr.start()
+        thr.join()
+        assert(caches[0] is not self._cache())
+        assert(len(self._cache()) == 0)
+
+    def test_freed_on_thread_exit(self):
+        def run():
+            self._cache().get('a', lambda: 'A')
+        thr = threading.Thread(target=run)
+        thr.start()
+        thr.join()
+        gc.collect()
+        assert(self.freed == ['A'])
+
+
 BBB_SAMPLE = os.path.join('tests', 'data', 'bbb_sample.ogg')
 
 
+class TestEnumValue(unittest.TestCase):
+    def test_rmap_cached(self):
+        assert(enum_rmap(PixelFormat) is enum_rmap(PixelFormat))
+
+    def test_rmap_starter(self):
+        assert(enum_rmap(MediaType) is not enum_rmap(MediaType, 0))
+        assert(enum_rmap(MediaType, 0)[0] == MediaType.AVMEDIA_TYPE_UNKNOWN)
+
+    def test_known_values(self):
+        assert(to_media_type(1) == MediaType.AVMEDIA_TYPE_AUDIO)
+        assert(to_pixel_format(0) == PixelFormat.AV_PIX_FMT_YUV420P)
+
+    def test_fallback(self):
+        assert(to_media_type(1024) == MediaType.AVMEDIA_TYPE_UNKNOWN)
+        assert(to_pixel_format(-1024) == PixelFormat.AV_PIX_FMT_NONE)
+
+    def test_same_as_uncached(self):
+        for ival in range(-2, len(PixelFormat)):
+            ref = dict(enumerate(PixelFormat, -1)).get(ival, None)
+            assert(to_enum_value(ival, PixelFormat, None) is ref)
+
+
+class TestLazyEnum(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+    def _names(self):
+        self.calls += 1
+        return ('mp4', 'avi', 'mov')
+
+    def test_not_built_on_creation(self):
+        fmts = LazyEnum('Format', self._names)
+        assert(fmts)
+        assert(not fmts.built)
+        assert(self.calls == 0)
+
+    def test_built_once(self):
+        fmts = LazyEnum('Format', self._names)
+        assert(fmts.avi.value == 'avi')
+        assert(fmts.mov.value == 'mov')
+        assert(fmts.built)
+        assert(self.calls == 1)
+
+    def test_behaves_like_enum(self):
+        fmts = LazyEnum('Format', self._names)
+        assert(len(fmts) == 3)
+        assert([fmt.value for fmt in fmts] == ['avi', 'mov', 'mp4'])
+        assert(fmts('mp4') is fmts['mp4'] is fmts.mp4)
+        assert(fmts.mp4 in fmts)
+        assert(isinstance(fmts.mp4, fmts))
+        assert(set(fmts.__members__) == set(self._names()))
+        assert(repr(fmts))
+
+    def test_missing_member(self):
+        fmts = LazyEnum('Format', self._names)
+        with self.assertRaises(AttributeError):
+            fmts.mkv
+
+
 class TestBlob(object):
     def test_binary(self):
         data = b'123'
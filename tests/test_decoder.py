@@ -7,6 +7,12 @@ import pyrana.ff
 import pyrana.formats
 import pyrana.errors
 import pyrana.codec
+import pyrana.common
+import pyrana.video
+from pyrana.codec import Discard
+from pyrana.video import SpeedTier, _speed_params
+
+from tests import fakes
 
 
 BBB_SAMPLE = os.path.join('tests', 'data', 'bbb_sample.ogg')
@@ -36,6 +42,35 @@ class TestBaseDecoder(unittest.TestCase):
         assert(dec)
         assert(repr(dec))
 
+    def test_decoder_video_threads(self):
+        params = {'threads': 2,
+                  'thread_type': pyrana.video.ThreadType.SLICE}
+        dec = pyrana.video.Decoder("mpeg1video", params)
+        assert(pyrana.common.get_field_int(dec._ctx, 'threads') == 2)
+        assert(pyrana.common.get_field_int(dec._ctx, 'thread_type') ==
+               pyrana.video.ThreadType.SLICE)
+
+    def test_decoder_video_speed_tier(self):
+        params = {'speed_tier': pyrana.video.SpeedTier.FASTEST}
+        dec = pyrana.video.Decoder("mpeg1video", params)
+        get = pyrana.common.get_field_int
+        assert(get(dec._ctx, 'skip_loop_filter') == Discard.ALL)
+        assert(get(dec._ctx, 'skip_idct') == Discard.NONREF)
+        assert(get(dec._ctx, 'lowres') == 2)
+
+    def test_decoder_video_speed_tier_override(self):
+        params = {'speed_tier': pyrana.video.SpeedTier.FASTER, 'lowres': 0}
+        dec = pyrana.video.Decoder("mpeg1video", params)
+        assert(pyrana.common.get_field_int(dec._ctx, 'lowres') == 0)
+
+    def test_decoder_video_bad_speed_tier(self):
+        with self.assertRaises(ValueError):
+            dec = pyrana.video.Decoder("mpeg1video", {'speed_tier': 42})
+
+    def test_decoder_video_bad_param(self):
+        with self.assertRaises(pyrana.errors.WrongParameterError):
+            dec = pyrana.video.Decoder("mpeg1video", {'inexistent': 1})
+
     def test_decoder_audio_empty_flush(self):
         dec = pyrana.audio.Decoder("flac")
         with self.assertRaises(pyrana.errors.NeedFeedError):
@@ -64,6 +99,22 @@ class TestBaseDecoder(unittest.TestCase):
             assert(frame)
             assert(repr(frame))
 
+    def test_decoder_video_from_file_threads(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f)
+            dec = dmx.open_decoder(0, {'threads': 2})
+            frame = dec.decode(dmx.stream(0))
+            assert(frame)
+            assert(pyrana.common.get_field_int(dec._ctx, 'threads') == 2)
+
+    def test_decoder_video_from_file_speed_tier(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f)
+            params = {'speed_tier': pyrana.video.SpeedTier.FASTEST}
+            dec = dmx.open_decoder(0, params)
+            frame = dec.decode(dmx.stream(0))
+            assert(frame)
+
     def test_decoder_video_from_file_xdata(self):
         with open(BBB_SAMPLE, 'rb') as f:
             dmx = pyrana.formats.Demuxer(f)
@@ -71,5 +122,45 @@ class TestBaseDecoder(unittest.TestCase):
             assert(dec.extra_data)
 
 
+class FakeCodec(object):
+    def __init__(self, max_lowres):
+        self.max_lowres = max_lowres
+
+
+class TestSpeedParams(unittest.TestCase):
+    def setUp(self):
+        self.ffh = fakes.FF(faulty=False)
+
+    def test_no_tier(self):
+        params = {'threads': 2}
+        assert(_speed_params(self.ffh, FakeCodec(3), params) is params)
+
+    def test_full(self):
+        params = {'speed_tier': SpeedTier.FULL}
+        assert(_speed_params(self.ffh, FakeCodec(3), params) == {})
+
+    def test_tier(self):
+        params = {'speed_tier': SpeedTier.FAST, 'threads': 2}
+        assert(_speed_params(self.ffh, FakeCodec(3), params) ==
+               {'skip_loop_filter': Discard.NONREF, 'threads': 2})
+        assert('speed_tier' in params)
+
+    def test_lowres_clamped(self):
+        params = {'speed_tier': SpeedTier.FASTEST}
+        assert(_speed_params(self.ffh, FakeCodec(1), params)['lowres'] == 1)
+        assert(_speed_params(self.ffh, FakeCodec(0), params)['lowres'] == 0)
+
+    def test_lowres_no_codec(self):
+        params = {'speed_tier': SpeedTier.FASTER}
+        assert(_speed_params(self.ffh, self.ffh.ffi.NULL,
+                             params)['lowres'] == 0)
+
+    def test_explicit_wins(self):
+        params = {'speed_tier': SpeedTier.FASTER,
+                  'skip_loop_filter': Discard.DEFAULT}
+        assert(_speed_params(self.ffh, FakeCodec(3), params) ==
+               {'skip_loop_filter': Discard.DEFAULT, 'lowres': 1})
+
+
 if __name__ == "__main__":
     unittest.main()
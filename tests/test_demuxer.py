@@ -1,11 +1,15 @@
 #!/usr/bin/python
 
 from pyrana.common import MediaType
+from pyrana.codec import Discard
 from pyrana.formats import STREAM_ANY
 import pyrana.errors
 import pyrana.formats
+import pyrana.iobridge
+import pyrana.packet
 import pyrana
 import io
+import mmap
 import unittest
 import hashlib
 import os
@@ -61,6 +65,63 @@ class TestDemuxer(unittest.TestCase):
             dmx = pyrana.formats.Demuxer(f)
             self.assertEqual(len(dmx.streams), 2)
 
+    def test_from_path(self):
+        dmx = pyrana.formats.Demuxer.from_path(BBB_SAMPLE)
+        self.assertEqual(len(dmx.streams), 2)
+
+    def test_from_path_same_packets(self):
+        dmx = pyrana.formats.Demuxer.from_path(BBB_SAMPLE)
+        with open(BBB_SAMPLE, 'rb') as f:
+            ref = pyrana.formats.Demuxer(f)
+            for _ in range(16):
+                assert(bytes(dmx.read_frame()) == bytes(ref.read_frame()))
+
+    def test_open_from_memory(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            data = f.read()
+        for src in (data, bytearray(data), memoryview(data)):
+            dmx = pyrana.formats.Demuxer(src)
+            self.assertEqual(len(dmx.streams), 2)
+
+    def test_open_from_mmap_same_packets(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            ref = pyrana.formats.Demuxer(f)
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            dmx = pyrana.formats.Demuxer(data)
+            for _ in range(16):
+                assert(bytes(dmx.read_frame()) == bytes(ref.read_frame()))
+
+    def test_readahead_none(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f)
+            assert dmx.readahead is None
+
+    def test_readahead_wrapped(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f, readahead=True)
+            assert isinstance(dmx.readahead, pyrana.iobridge.ReadAhead)
+            dmx.read_frame()
+            assert dmx.readahead.peak > 0
+
+    def test_readahead_given(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            src = pyrana.iobridge.ReadAhead(f, high=8192, low=4096)
+            dmx = pyrana.formats.Demuxer(src, readahead=True)
+            assert dmx.readahead is src
+            self.assertEqual(dmx.readahead.high_watermark, 8192)
+            self.assertEqual(len(dmx.streams), 2)
+            dmx.close()
+            assert src._closed
+
+    def test_from_path_missing(self):
+        with self.assertRaises(pyrana.errors.SetupError):
+            dmx = pyrana.formats.Demuxer.from_path(BBB_SAMPLE + '.missing')
+
+    def test_from_path_delay_open(self):
+        dmx = pyrana.formats.Demuxer.from_path(BBB_SAMPLE, delay_open=True)
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            assert dmx.streams
+
     def test_empty_streams_without_open(self):
         with self.assertRaises(pyrana.errors.ProcessingError), \
                 io.BytesIO(_B) as f:
@@ -99,6 +160,159 @@ class TestDemuxer(unittest.TestCase):
         with self.assertRaises(pyrana.errors.EOSError):
             pyrana.formats._read_frame(ffh, ctx, mock_new_pkt, 0)
 
+    def test_read_frames_faulty(self):
+        ffh = fakes.FF(faulty=True)
+        ctx = fakes.AVFormatContext()
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            pyrana.formats._read_frames(ffh, ctx, mock_new_pkt, 0, 8)
+
+    def test_read_frames_empty(self):
+        ffh = fakes.FF(faulty=False)
+        ctx = fakes.AVFormatContext()
+        with self.assertRaises(pyrana.errors.EOSError):
+            pyrana.formats._read_frames(ffh, ctx, mock_new_pkt, 0, 8)
+
+    def test_read_frames_partial(self):
+        ffh = fakes.FF(faulty=False)
+        ffh.lavf = fakes.FlakyLavf(good=3)
+        ctx = fakes.AVFormatContext()
+        batch = pyrana.formats._read_frames(ffh, ctx,
+                                            lambda ffh, size: fakes.Packet(),
+                                            STREAM_ANY, 8)
+        assert(len(batch) == 3)
+        assert(bytes(batch.data) == b'abc' * 3)
+        assert(isinstance(batch.error, pyrana.errors.ProcessingError))
+
+    def test_read_frames_pool_release(self):
+        released = []
+        class Pool(object):
+            def release(self, pkt):
+                released.append(pkt)
+        pkt = fakes.Packet()
+        ffh = fakes.FF(faulty=False)
+        ffh.lavf = fakes.FlakyLavf(good=2)
+        ctx = fakes.AVFormatContext()
+        pyrana.formats._read_frames(ffh, ctx, lambda ffh, size: pkt,
+                                    STREAM_ANY, 8, Pool())
+        assert(released == [pkt])
+
+    def test_read_pool_release(self):
+        class Pool(object):
+            def __init__(self):
+                self.released = []
+            def release(self, pkt):
+                self.released.append(pkt)
+        for faulty, exc in ((True, pyrana.errors.ProcessingError),
+                            (False, pyrana.errors.EOSError)):
+            pool, pkt = Pool(), fakes.Packet()
+            ffh = fakes.FF(faulty=faulty)
+            ctx = fakes.AVFormatContext()
+            with self.assertRaises(exc):
+                pyrana.formats._read_frame(ffh, ctx, lambda ffh, size: pkt,
+                                           STREAM_ANY, pool)
+            assert(pool.released == [pkt])
+
+    def test_read_frames(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f)
+            pkts = [dmx.read_frame() for _ in range(16)]
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f)
+            batch = dmx.read_frames(16)
+        assert(len(batch) == 16)
+        for idx, pkt in enumerate(pkts):
+            assert(batch.stream_ids[idx] == pkt.stream_id)
+            assert(batch.pts[idx] == pkt.pts)
+            assert(batch.is_key(idx) == pkt.is_key)
+            assert(bytes(batch.payload(idx)) == bytes(pkt))
+
+    def test_read_frames_until_eos(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f)
+            total = 0
+            with self.assertRaises(pyrana.errors.EOSError):
+                while True:
+                    total += len(dmx.read_frames(64, 0))
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f)
+            count = 0
+            with self.assertRaises(pyrana.errors.EOSError):
+                while True:
+                    dmx.read_frame(0)
+                    count += 1
+            assert(total == count)
+
+    def test_read_with_pool(self):
+        pool = pyrana.packet.PacketPool(2)
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f, pool=pool)
+            for _ in range(16):
+                pkt = dmx.read_frame()
+                assert(len(pkt))
+            del pkt
+        assert(pool.allocated == 0)
+        assert(len(pool) == 2)
+
+    def test_set_discard(self):
+        ctx = fakes.AVFormatContext(3)
+        pyrana.formats._set_discard(ctx, set([1]))
+        self.assertEqual([st.discard for st in ctx.streams],
+                         [Discard.ALL, Discard.DEFAULT, Discard.ALL])
+        pyrana.formats._set_discard(ctx, set())
+        self.assertEqual([st.discard for st in ctx.streams],
+                         [Discard.DEFAULT] * 3)
+
+    def test_want_stream(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f)
+            assert(not dmx.wanted_streams)
+            dmx.want_stream(1)
+            assert(dmx.wanted_streams == frozenset([1]))
+            for _ in range(16):
+                assert(dmx.read_frame().stream_id == 1)
+
+    def test_want_stream_invalid(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f)
+            for sid in (-1, len(dmx.streams)):
+                with self.assertRaises(pyrana.errors.ProcessingError):
+                    dmx.want_stream(sid)
+            assert(not dmx.wanted_streams)
+
+    def test_ensure_stream_id_bounds(self):
+        dmx = object.__new__(pyrana.formats.Demuxer)
+        dmx._ff = fakes.FF(faulty=False)
+        dmx._pctx = [None]
+        dmx._readahead = None
+        dmx._streams = ['audio', 'video']
+        dmx._ensure_stream_id(0)
+        dmx._ensure_stream_id(1)
+        for sid in (-1, 2):
+            with self.assertRaises(pyrana.errors.ProcessingError):
+                dmx._ensure_stream_id(sid)
+
+    def test_reset_streams(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f)
+            dmx.want_stream(1)
+            dmx.reset_streams()
+            sids = set(dmx.read_frame().stream_id for _ in range(64))
+            assert(sids == set([0, 1]))
+
+    def test_stream_wants(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f)
+            pkt = next(dmx.stream(0))
+            assert(pkt.stream_id == 0)
+            assert(dmx.wanted_streams == frozenset([0]))
+
+    def test_open_decoder_wants(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            dmx = pyrana.formats.Demuxer(f)
+            dmx.open_decoder(0)
+            dmx.open_decoder(1)
+            assert(dmx.wanted_streams == frozenset([0, 1]))
+
     def test_open_decoder_invalid_stream1(self):
         with open(BBB_SAMPLE, 'rb') as f:
             dmx = pyrana.formats.Demuxer(f)
@@ -2,6 +2,8 @@
 
 import os
 import os.path
+import shutil
+import tempfile
 import warnings
 from pyrana.common import MediaType
 from pyrana.formats import STREAM_ANY
@@ -14,6 +16,8 @@ import unittest
 
 
 BBB_SAMPLE = os.path.join('tests', 'data', 'bbb_sample.ogg')
+# H.264 in MP4, with B-frames: the keyframes have dts < pts.
+BFRAMES_SAMPLE = os.path.join('tests', 'data', 'bframes_h264.mp4')
 
 
 class TestDemuxerSeek(unittest.TestCase):
@@ -76,5 +80,116 @@ class TestDemuxerSeek(unittest.TestCase):
                     dmx.seek_ts(-1e5, STREAM_ANY)
 
 
+class TestDemuxerSeekFrame(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pyrana.setup()
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.media = os.path.join(self.tmpdir, 'bbb_sample.ogg')
+        shutil.copy(BBB_SAMPLE, self.media)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _decode_all(self, sid, media=None):
+        dmx = pyrana.formats.Demuxer.from_path(media or self.media)
+        dec = dmx.open_decoder(sid)
+        frames = []
+        try:
+            while True:
+                frm = dec.decode(dmx.stream(sid))
+                frames.append((frm.cdata.pkt_pts, bytes(frm.image())))
+        except pyrana.errors.EOSError:
+            pass
+        return frames
+
+    def test_seek_frame_needs_index(self):
+        dmx = pyrana.formats.Demuxer.from_path(self.media)
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            dmx.seek_frame(3, 0)
+
+    def test_seek_frame_needs_stream(self):
+        dmx = pyrana.formats.Demuxer.from_path(self.media, index=True)
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            dmx.seek_frame(3)
+
+    def test_seek_frame_out_of_range(self):
+        dmx = pyrana.formats.Demuxer.from_path(self.media, index=True)
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            dmx.seek_frame(dmx.index.frame_count(0), 0)
+
+    def test_decode_at_frameno(self):
+        ref = self._decode_all(0)
+        dmx = pyrana.formats.Demuxer.from_path(self.media, index=True)
+        dec = dmx.open_decoder(0)
+        for frameno in (len(ref) - 1, 3, 0, len(ref) // 2):
+            frm = dmx.decode_at(dec, 0, frameno=frameno)
+            self.assertEqual(frm.cdata.pkt_pts, ref[frameno][0])
+            self.assertEqual(bytes(frm.image()), ref[frameno][1])
+
+    def test_decode_at_frameno_continues(self):
+        ref = self._decode_all(0)
+        dmx = pyrana.formats.Demuxer.from_path(self.media, index=True)
+        dec = dmx.open_decoder(0)
+        dmx.decode_at(dec, 0, frameno=3)
+        frm = dec.decode(dmx.stream(0))
+        self.assertEqual(frm.cdata.pkt_pts, ref[4][0])
+
+    def test_decode_at_tstamp(self):
+        ref = self._decode_all(0)
+        dmx = pyrana.formats.Demuxer.from_path(self.media, index=True)
+        dec = dmx.open_decoder(0)
+        frm = dmx.decode_at(dec, 0, tstamp=ref[5][0])
+        self.assertEqual(frm.cdata.pkt_pts, ref[5][0])
+
+    def test_decode_at_bframes(self):
+        media = os.path.join(self.tmpdir, 'bframes_h264.mp4')
+        shutil.copy(BFRAMES_SAMPLE, media)
+        ref = self._decode_all(0, media)
+        dmx = pyrana.formats.Demuxer.from_path(media, index=True)
+        dec = dmx.open_decoder(0)
+        # a keyframe, the frames just before and after it, and the last.
+        for frameno in (12, 11, 13, 30, len(ref) - 1):
+            frm = dmx.decode_at(dec, 0, frameno=frameno)
+            self.assertEqual(frm.cdata.pkt_pts, ref[frameno][0])
+            self.assertEqual(bytes(frm.image()), ref[frameno][1])
+
+    def test_keyframes(self):
+        dmx = pyrana.formats.Demuxer.from_path(self.media)
+        pkts = list(dmx.keyframes(0))
+        assert(pkts)
+        assert(all(pkt.is_key and pkt.stream_id == 0 for pkt in pkts))
+
+    def test_keyframes_interval(self):
+        dmx = pyrana.formats.Demuxer.from_path(self.media)
+        every = list(dmx.keyframes(0))
+        interval = (every[-1].pts - every[0].pts) // 3
+        found = []
+        for index in (False, True):
+            dmx = pyrana.formats.Demuxer.from_path(self.media, index=index)
+            pts = [pkt.pts for pkt in dmx.keyframes(0, interval)]
+            assert(1 < len(pts) <= 4)
+            assert(all(nxt - cur >= interval
+                       for cur, nxt in zip(pts, pts[1:])))
+            found.append(pts)
+        # seeking over the packets doesn't change the keyframes picked.
+        self.assertEqual(found[0], found[1])
+
+    def test_decode_keyframes(self):
+        dmx = pyrana.formats.Demuxer.from_path(self.media)
+        dec = dmx.open_decoder(0)
+        dec.keyframes_only = True
+        frm = dec.decode(dmx.keyframes(0))
+        assert(frm.is_key)
+
+    def test_decode_at_nothing(self):
+        dmx = pyrana.formats.Demuxer.from_path(self.media, index=True)
+        dec = dmx.open_decoder(0)
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            dmx.decode_at(dec, 0)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -88,6 +88,30 @@ class TestEncoderVideo(unittest.TestCase):
         with self.assertRaises(pyrana.errors.NeedFeedError):
             pkt = enc.flush()
 
+    def test_encoder_encode25_packets_threads(self):
+        pixfmt = pyrana.video.PixelFormat.AV_PIX_FMT_YUV420P
+        params = dict(self.params)
+        params['threads'] = 2
+        params['thread_type'] = pyrana.video.ThreadType.SLICE
+        enc = pyrana.video.Encoder("mjpeg", params)
+        frm = pyrana.video.Frame(self.params['width'],
+                                 self.params['height'],
+                                 pixfmt)
+        pkts = []
+        for i in range(25):
+            frm.cdata.format = pixfmt
+            pyrana.video.fill_yuv420p(frm, i)
+            # hack, do no try this at home
+            frm.cdata.format = self.pixfmt
+            pkts.extend(enc.encode_packets(frm))
+        pkts.extend(enc.flush_packets())
+        assert(len(pkts) == 25)
+        assert(all(pkt.size > 0 for pkt in pkts))
+
+    def test_encoder_flush_packets_nothing(self):
+        enc = pyrana.video.Encoder("mjpeg", self.params)
+        assert(enc.flush_packets() == [])
+
     def test_encoder_flush_nothing(self):
         pixfmt = pyrana.video.PixelFormat.AV_PIX_FMT_YUV420P
         enc = pyrana.video.Encoder("mjpeg", self.params)
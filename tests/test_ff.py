@@ -1,11 +1,15 @@
 #!/usr/bin/python
 
 import itertools
+import os.path
+import shutil
+import tempfile
 import unittest
+import warnings
 import pyrana.ff
 import pyrana.errors
 from pyrana.ff import singleton, HLoader
-from pyrana.ff import _try_to_load
+from pyrana.ff import _try_to_load, _load_ffi, module_name
 
 
 class TestHLoader(unittest.TestCase):
@@ -16,6 +20,39 @@ class TestHLoader(unittest.TestCase):
             x = _hl.hfiles
 
 
+class TestLoadFFI(unittest.TestCase):
+    def setUp(self):
+        vers = ((52, 0, 0), (55, 0, 0), (55, 0, 0), (2, 0, 0), (0, 0, 0))
+        self.hfiles = HLoader(vers).hfiles
+
+    def test_module_name(self):
+        name = module_name(self.hfiles)
+        assert(name.startswith('_ffi_avutil52_avcodec55_avformat55'))
+        assert(name == module_name(self.hfiles))
+
+    def test_module_name_differs(self):
+        vers = ((52, 0, 0), (54, 0, 0), (54, 0, 0), (2, 0, 0), (0, 0, 0))
+        assert(module_name(self.hfiles) != module_name(HLoader(vers).hfiles))
+
+    def test_module_name_path_independent(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            copies = []
+            for hfile in self.hfiles:
+                shutil.copy(hfile, tmpdir)
+                copies.append(os.path.join(tmpdir, os.path.basename(hfile)))
+            assert(module_name(self.hfiles) == module_name(copies))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_fallback(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            ffi, precompiled = _load_ffi(self.hfiles[:1])
+        assert(not precompiled)
+        assert(ffi.sizeof('AVRational') == 8)
+
+
 class TestSingletonDecorator(unittest.TestCase):
     def test_singleton(self):
         @singleton
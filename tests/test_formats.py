@@ -6,8 +6,14 @@ import pyrana.video
 import pyrana.formats
 import pyrana.common
 import pyrana.ff
+import os
+import os.path
+import shutil
+import tempfile
 import unittest
 
+from tests import fakes
+
 
 class TestCommonData(unittest.TestCase):
     @classmethod
@@ -17,6 +23,11 @@ class TestCommonData(unittest.TestCase):
     def _assert_valid_collection(self, col):
         self.assertTrue(len(col) > 0)
 
+    def test_lazy_formats(self):
+        assert isinstance(pyrana.formats.InputFormat,
+                          pyrana.common.LazyEnum)
+        assert pyrana.formats.InputFormat.avi.value == 'avi'
+
     def test_input_formats(self):
         self._assert_valid_collection(pyrana.formats.InputFormat)
 
@@ -52,11 +63,122 @@ class TestCommonData(unittest.TestCase):
         with self.assertRaises(pyrana.errors.UnsupportedError):
             fmt = pyrana.common.find_source_format("Azathoth")
 
+    def test_registry_built_once(self):
+        reg = pyrana.common.registry()
+        assert pyrana.common.registry() is reg
+        assert len(reg.decoders)
+        assert len(reg.encoders)
+
+    def test_find_source_format_grouped_name(self):
+        ffh = pyrana.ff.get_handle()
+        fmt = pyrana.common.find_source_format("mp4")
+        assert ffh.ffi.NULL != fmt
+
+    def test_combined_codecs(self):
+        assert pyrana.video.InputCodec is pyrana.video.OutputCodec
+        assert pyrana.audio.InputCodec is pyrana.audio.OutputCodec
+        names = set(codec.value for codec in pyrana.video.InputCodec)
+        assert 'h264' in names
+        assert 'mjpeg' in names
+
+    def test_separate_codecs(self):
+        names = set(codec.value for codec in pyrana.video.DecoderCodec)
+        assert 'h264' in names
+        names = set(codec.value for codec in pyrana.video.EncoderCodec)
+        assert 'mjpeg' in names
+        assert len(pyrana.video.DecoderCodec) <= len(pyrana.video.InputCodec)
+
     def test_find_source_format_none(self):
         ffh = pyrana.ff.get_handle()
         fmt = pyrana.common.find_source_format(None)
         assert ffh.ffi.NULL == fmt
 
 
+_REG_DATA = {
+    'input_formats': ['avi', 'mov', 'mp4'],
+    'output_formats': ['avi', 'mp4'],
+    'decoders': {'mjpeg': 0, 'flac': 1, 'h264': 0},
+    'encoders': {'mjpeg': 0, 'flac': 1},
+}
+
+
+class FakeHandle(object):
+    def versions(self):
+        return [(52, 48, 100), (55, 39, 100), (55, 19, 104),
+                (2, 5, 101), (0, 17, 104)]
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_from_dict(self):
+        reg = pyrana.common.Registry.from_dict(_REG_DATA)
+        assert repr(reg)
+        assert 'mp4' in reg.input_formats
+        assert 'h264' in reg.decoders
+        assert 'h264' not in reg.encoders
+
+    def test_roundtrip(self):
+        reg = pyrana.common.Registry.from_dict(_REG_DATA)
+        assert reg.to_dict() == _REG_DATA
+
+    def test_codec_names(self):
+        reg = pyrana.common.Registry.from_dict(_REG_DATA)
+        video = pyrana.common.MediaType.AVMEDIA_TYPE_VIDEO
+        assert reg.decoder_names(video) == ['h264', 'mjpeg']
+        assert reg.encoder_names(video) == ['mjpeg']
+        audio = pyrana.common.MediaType.AVMEDIA_TYPE_AUDIO
+        assert reg.codec_names(audio) == ['flac']
+        assert reg.codec_names(video) == ['h264', 'mjpeg']
+
+    def test_unknown_input_format(self):
+        reg = pyrana.common.Registry.from_dict(_REG_DATA)
+        with self.assertRaises(pyrana.errors.UnsupportedError):
+            reg.input_format(FakeHandle(), 'Azathoth')
+
+    def test_grouped_input_format(self):
+        reg = pyrana.common.Registry.from_dict(_REG_DATA)
+        ffh = fakes.FF(faulty=False)
+        ffh.lavf.av_find_input_format = lambda name: name
+        assert reg.input_format(ffh, 'mov,mp4') == b'mov,mp4'
+        assert reg.input_format(ffh, 'mp4') == b'mp4'
+
+    def test_grouped_input_format_unknown(self):
+        reg = pyrana.common.Registry.from_dict(_REG_DATA)
+        with self.assertRaises(pyrana.errors.UnsupportedError):
+            reg.input_format(FakeHandle(), 'mov,Azathoth')
+
+    def test_cache_roundtrip(self):
+        reg = pyrana.common.Registry.from_dict(_REG_DATA)
+        path = pyrana.common._registry_path(self.tmpdir,
+                                            FakeHandle().versions())
+        pyrana.common._store_registry(path, reg)
+        assert pyrana.common._load_registry(path).to_dict() == _REG_DATA
+
+    def test_cache_missing(self):
+        path = os.path.join(self.tmpdir, 'registry.json')
+        assert pyrana.common._load_registry(path) is None
+
+    def test_cache_corrupted(self):
+        path = os.path.join(self.tmpdir, 'registry.json')
+        with open(path, 'w') as dst:
+            dst.write('{"input_formats": [')
+        assert pyrana.common._load_registry(path) is None
+
+    def test_registry_from_cache(self):
+        ffh = FakeHandle()
+        reg = pyrana.common.Registry.from_dict(_REG_DATA)
+        path = pyrana.common._registry_path(self.tmpdir, ffh.versions())
+        pyrana.common._store_registry(path, reg)
+        # FakeHandle has no libraries to walk through.
+        reg = pyrana.common.registry(ffh, self.tmpdir)
+        assert reg.to_dict() == _REG_DATA
+        assert pyrana.common.registry(ffh) is reg
+
+
 if __name__ == "__main__":
     unittest.main()
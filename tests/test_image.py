@@ -54,6 +54,24 @@ class TestImage(unittest.TestCase):
             pyrana.video._image_from_frame(ffh, None, frame, pixfmt)
         assert(ffh.sws.scale_done == 1)
 
+    def test_reuse_sws_context(self):
+        pixfmt = pyrana.video.PixelFormat.AV_PIX_FMT_RGB24
+        frame = fakes.Frame(pyrana.video.PixelFormat.AV_PIX_FMT_YUV420P)
+        ffh = fakes.FF(faulty=False)
+        for _ in range(3):
+            img = pyrana.video._image_from_frame(ffh, None, frame, pixfmt)
+        assert(ffh.sws.context_got == 1)
+        assert(ffh.sws.scale_done == 3)
+
+    def test_evict_sws_context(self):
+        frame = fakes.Frame(pyrana.video.PixelFormat.AV_PIX_FMT_YUV420P)
+        ffh = fakes.FF(faulty=False)
+        for width in range(pyrana.video.SWS_CACHE_SIZE + 1):
+            frame.width = width + 1
+            img = pyrana.video._image_from_frame(
+                ffh, None, frame, pyrana.video.PixelFormat.AV_PIX_FMT_RGB24)
+        assert(ffh.sws.context_freed == 1)
+
     def test_new_frame(self):
         pixfmt = pyrana.video.PixelFormat.AV_PIX_FMT_YUV420P  # 0
         frm, img = _new_frame(pixfmt)
@@ -72,27 +90,82 @@ class TestImage(unittest.TestCase):
         with self.assertRaises(pyrana.errors.ProcessingError):
             pyrana.video.fill_yuv420p(frm, 0)
 
+    def test_plane_view(self):
+        pixfmt = pyrana.video.PixelFormat.AV_PIX_FMT_YUV420P  # 0
+        frm, img = _new_frame(pixfmt)
+        pyrana.video.fill_yuv420p(frm, 0)
+        view = img.plane_view(0)
+        assert(view.shape == (img.height, frm.cdata.linesize[0]))
+        assert(view[1, 0] == img.plane(0)[img.width])
 
+    def test_plane_view_keeps_frame_alive(self):
+        pixfmt = pyrana.video.PixelFormat.AV_PIX_FMT_YUV420P  # 0
+        frm, img = _new_frame(pixfmt)
+        pyrana.video.fill_yuv420p(frm, 0)
+        ref = img.plane(2)
+        view = img.plane_view(2)
+        del frm, img
+        assert(view.tobytes() == ref)
 
-class TestPlaneCopy(unittest.TestCase):
-    def test__plane_copy_bad_src_linesize(self):
-        dst = bytearray(16)
-        src = b'a' * 16
+    def test_plane_view_bad_plane(self):
+        pixfmt = pyrana.video.PixelFormat.AV_PIX_FMT_RGB24
+        frm, img = _new_frame(pixfmt)
         with self.assertRaises(pyrana.errors.ProcessingError):
-            num = pyrana.video._plane_copy(dst, src, 15, 16, 16, 1)
+            view = img.plane_view(1)
 
-    def test__plane_copy_bad_src_linesize(self):
-        dst = bytearray(16)
-        src = b'a' * 16
+    @pytest.mark.skipif(pyrana.video.numpy is None,
+                        reason="requires numpy")
+    def test_as_array(self):
+        pixfmt = pyrana.video.PixelFormat.AV_PIX_FMT_YUV420P  # 0
+        frm, img = _new_frame(pixfmt)
+        pyrana.video.fill_yuv420p(frm, 0)
+        arr = img.as_array(1)
+        assert(arr.shape == (img.height // 2, img.width // 2))
+        assert(arr.tobytes() == img.plane(1))
+
+
+
+class TestPlanePack(unittest.TestCase):
+    def test__plane_pack_bad_dst_linesize(self):
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            num = pyrana.video._plane_pack(None, None, None, 15, 16, 16, 1)
+
+    def test__plane_pack_bad_src_linesize(self):
         with self.assertRaises(pyrana.errors.ProcessingError):
-            num = pyrana.video._plane_copy(dst, src, 16, 15, 16, 1)
+            num = pyrana.video._plane_pack(None, None, None, 16, 15, 16, 1)
 
-    def test__plane_copy(self):
-        dst = bytearray(16)
+    def _pack(self, src, dst_linesize, src_linesize, bwidth, height):
+        pyrana.setup()
+        ffh = pyrana.ff.get_handle()
+        size = dst_linesize * height
+        dst = ffh.ffi.new('uint8_t[]', size)
+        plane = ffh.ffi.new('uint8_t[]', src)
+        num = pyrana.video._plane_pack(ffh, dst, plane,
+                                       dst_linesize, src_linesize,
+                                       bwidth, height)
+        assert(num == size)
+        return ffh.ffi.buffer(dst, size)[:]
+
+    def test__plane_pack(self):
         src = b'a' * 16
-        num = pyrana.video._plane_copy(dst, src, 16, 16, 16, 1)
-        assert(dst == src)
+        assert(self._pack(src, 16, 16, 16, 1) == src)
+
+    def test__plane_pack_same_stride(self):
+        dst = self._pack(b'ab' * 12, 8, 8, 6, 3)
+        assert(dst[0:6] == dst[8:14] == dst[16:22] == b'ababab')
 
+    def test__plane_pack_strided(self):
+        dst = self._pack(b'abcdXXXXefghXXXXijklXXXX', 4, 8, 4, 3)
+        assert(dst == b'abcdefghijkl')
+
+    def test_image_blob_planes(self):
+        pyrana.setup()
+        pixfmt = pyrana.video.PixelFormat.AV_PIX_FMT_YUV420P  # 0
+        frm, img = _new_frame(pixfmt)
+        pyrana.video.fill_yuv420p(frm, 0)
+        data = img.blob()
+        assert(len(data) == len(img))
+        assert(data == img.plane(0) + img.plane(1) + img.plane(2))
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,225 @@
+#!/usr/bin/python
+
+import os
+import os.path
+import shutil
+import tempfile
+import unittest
+try:
+    import pathlib
+except ImportError:
+    pathlib = None
+import pyrana
+import pyrana.errors
+import pyrana.formats
+import pyrana.index
+from pyrana.index import KeyframeIndex, sidecar_path
+from pyrana.packet import TS_NULL
+
+
+BBB_SAMPLE = os.path.join('tests', 'data', 'bbb_sample.ogg')
+
+
+def _fill(idx):
+    # two streams, a keyframe every 4 packets on stream 0.
+    for num in range(16):
+        idx.add(0, num * 10, num * 10, num * 100, num % 4 == 0)
+        idx.add(1, num * 5, num * 5, num * 100 + 50, True)
+    return idx
+
+
+class TestKeyframeIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.media = os.path.join(self.tmpdir, 'media.ogg')
+        with open(self.media, 'wb') as dst:
+            dst.write(b'\0' * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_new_empty(self):
+        idx = KeyframeIndex()
+        assert(len(idx) == 0)
+        assert(repr(idx))
+
+    def test_add(self):
+        idx = _fill(KeyframeIndex())
+        assert(len(idx) == 32)
+        assert(idx.is_key(0))
+        assert(not idx.is_key(2))
+
+    def test_keyframe(self):
+        idx = _fill(KeyframeIndex())
+        assert(idx.keyframe(0, 0) == (0, 0))
+        assert(idx.keyframe(0, 39) == (0, 0))
+        assert(idx.keyframe(0, 40) == (40, 400))
+        assert(idx.keyframe(0, 1000) == (120, 1200))
+
+    def test_keyframe_dts(self):
+        idx = KeyframeIndex()
+        # I P B B I: the keyframes are decoded before being shown.
+        for pts, dts, key in ((20, 0, True), (50, 10, False),
+                              (30, 20, False), (40, 30, False),
+                              (80, 60, True), (70, 70, False)):
+            idx.add(0, pts, dts, pts * 10, key)
+        assert(idx.keyframe(0, 79) == (20, 200))
+        assert(idx.keyframe_dts(0, 79) == 0)
+        assert(idx.keyframe(0, 80) == (80, 800))
+        assert(idx.keyframe_dts(0, 80) == 60)
+
+    def test_keyframe_dts_missing(self):
+        idx = KeyframeIndex()
+        idx.add(0, 10, TS_NULL, 0, True)
+        assert(idx.keyframe_dts(0, 10) == 10)
+
+    def test_keyframe_before_first(self):
+        idx = _fill(KeyframeIndex())
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            idx.keyframe(0, -1)
+
+    def test_frame_ts(self):
+        idx = _fill(KeyframeIndex())
+        assert(idx.frame_count(0) == 16)
+        assert(idx.frame_ts(0, 3) == 30)
+        assert(idx.frame_ts(1, 3) == 15)
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            idx.frame_ts(0, 16)
+
+    def test_frame_ts_presentation_order(self):
+        idx = KeyframeIndex()
+        for pts in (0, 30, 10, 20):
+            idx.add(0, pts, TS_NULL, -1, pts == 0)
+        assert([idx.frame_ts(0, n) for n in range(4)] == [0, 10, 20, 30])
+
+    def test_save_load(self):
+        idx = _fill(KeyframeIndex())
+        side = sidecar_path(self.media)
+        idx.save(side, self.media)
+        idx2 = KeyframeIndex.load(side, self.media)
+        for name in ('stream_ids', 'pts', 'dts', 'pos', 'flags'):
+            assert(getattr(idx, name) == getattr(idx2, name))
+        assert(idx2.keyframe(0, 50) == (40, 400))
+
+    def test_save_overwrite(self):
+        side = sidecar_path(self.media)
+        KeyframeIndex().save(side, self.media)
+        idx = _fill(KeyframeIndex())
+        idx.save(side, self.media)
+        assert(KeyframeIndex.load(side, self.media).pts == idx.pts)
+        assert(not os.path.exists(side + '.tmp'))
+
+    def test_replace_without_os_replace(self):
+        src = os.path.join(self.tmpdir, 'src')
+        dst = os.path.join(self.tmpdir, 'dst')
+        for name, data in ((src, b'new'), (dst, b'old')):
+            with open(name, 'wb') as out:
+                out.write(data)
+        replace = getattr(os, 'replace', None)
+        if replace is not None:
+            del os.replace
+        try:
+            pyrana.index._replace(src, dst)
+        finally:
+            if replace is not None:
+                os.replace = replace
+        with open(dst, 'rb') as res:
+            assert(res.read() == b'new')
+        assert(not os.path.exists(src))
+
+    def test_sidecar_path_types(self):
+        assert(sidecar_path('a.ogg') == 'a.ogg.pyridx')
+        assert(sidecar_path(b'a.ogg') == b'a.ogg.pyridx')
+
+    @unittest.skipIf(pathlib is None or not hasattr(os, 'fspath'),
+                     "requires path-like objects")
+    def test_sidecar_path_pathlike(self):
+        assert(sidecar_path(pathlib.Path('a.ogg')) == 'a.ogg.pyridx')
+
+    def test_save_load_bytes(self):
+        idx = _fill(KeyframeIndex())
+        media = self.media.encode('utf-8')
+        side = sidecar_path(media)
+        idx.save(side, media)
+        assert(KeyframeIndex.load(side, media).pts == idx.pts)
+
+    def test_sidecar_size(self):
+        idx = _fill(KeyframeIndex())
+        side = sidecar_path(self.media)
+        idx.save(side, self.media)
+        assert(os.path.getsize(side) == 36 + len(idx) * 29)
+
+    def test_load_stale(self):
+        idx = _fill(KeyframeIndex())
+        side = sidecar_path(self.media)
+        idx.save(side, self.media)
+        with open(self.media, 'ab') as dst:
+            dst.write(b'\0')
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            KeyframeIndex.load(side, self.media)
+
+    def test_load_truncated(self):
+        idx = _fill(KeyframeIndex())
+        side = sidecar_path(self.media)
+        idx.save(side, self.media)
+        with open(side, 'rb+') as dst:
+            dst.truncate(64)
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            KeyframeIndex.load(side, self.media)
+
+    def test_load_bad_magic(self):
+        side = sidecar_path(self.media)
+        with open(side, 'wb') as dst:
+            dst.write(b'\0' * 128)
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            KeyframeIndex.load(side, self.media)
+
+
+class TestDemuxerIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pyrana.setup()
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.media = os.path.join(self.tmpdir, 'bbb_sample.ogg')
+        shutil.copy(BBB_SAMPLE, self.media)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_scan(self):
+        with open(BBB_SAMPLE, 'rb') as f:
+            idx = KeyframeIndex.scan(pyrana.formats.Demuxer(f))
+        assert(len(idx) > 0)
+        assert(any(idx.is_key(n) for n in range(len(idx))))
+
+    def test_from_path_saves_sidecar(self):
+        idx = KeyframeIndex.from_path(self.media)
+        assert(os.path.exists(sidecar_path(self.media)))
+        idx2 = KeyframeIndex.from_path(self.media)
+        assert(idx.pts == idx2.pts)
+
+    def test_demuxer_from_path_bytes(self):
+        dmx = pyrana.formats.Demuxer.from_path(self.media.encode('utf-8'),
+                                               index=True)
+        assert(len(dmx.streams) == 2)
+        assert(os.path.exists(sidecar_path(self.media)))
+
+    def test_seek_keyframe(self):
+        dmx = pyrana.formats.Demuxer.from_path(self.media, index=True)
+        sid = 0
+        last = dmx.index.frame_ts(sid, dmx.index.frame_count(sid) - 1)
+        key_ts = dmx.seek_keyframe(last, sid)
+        pkt = dmx.read_frame(sid)
+        assert(pkt.is_key)
+        assert(pkt.pts == key_ts)
+
+    def test_seek_keyframe_no_index(self):
+        dmx = pyrana.formats.Demuxer.from_path(self.media)
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            dmx.seek_keyframe(0, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,14 @@
 #!/usr/bin/python
 
 import io
+import os
 import sys
+import time
 import random
 import unittest
 import pytest
+import cffi
+import pyrana.errors
 import pyrana.iobridge
 
 
@@ -85,6 +89,34 @@ class TestIOBridge(unittest.TestCase):
         src = pyrana.iobridge.IOBridge(f, bufsize=size)
         assert src
 
+    def test_default_size(self):
+        f = io.BytesIO(_BZ)
+        src = pyrana.iobridge.IOBridge(f)
+        assert src.bufsize == pyrana.iobridge.IO_BUF_SIZE
+
+    def test_custom_size_aligned(self):
+        f = io.BytesIO(_BZ)
+        size = pyrana.iobridge.PKT_SIZE + 1
+        src = pyrana.iobridge.IOBridge(f, bufsize=size)
+        assert src.bufsize == pyrana.iobridge.PKT_SIZE * 2
+
+    def test_iosource_size(self):
+        f = io.BytesIO(_BZ)
+        src = pyrana.iobridge.iosource(f, False, _BLEN)
+        assert src.bufsize == _BLEN
+
+    def test_close_twice(self):
+        f = io.BytesIO(_BZ)
+        src = pyrana.iobridge.IOBridge(f)
+        src.close()
+        src.close()
+        assert src.avio == pyrana.ff.get_handle().ffi.NULL
+
+    def test_aligned_size(self):
+        assert pyrana.iobridge._aligned_size(0) == pyrana.iobridge.PKT_SIZE
+        assert pyrana.iobridge._aligned_size(pyrana.iobridge.PKT_SIZE) == \
+            pyrana.iobridge.PKT_SIZE
+
     @pytest.mark.skipif(sys.version_info < (3,),
                        reason="requires python3")
     def test_read(self):
@@ -124,6 +156,229 @@ class TestIOBridge(unittest.TestCase):
         pyrana.iobridge._seek(h, 128, 0)
         self.assertEqual(f.tell(), 128)
 
+    def test_seek_size_bytesio(self):
+        ffh = pyrana.ff.get_handle()
+        f = io.BytesIO(_BZ)
+        f.seek(128)
+        h = ffh.ffi.new_handle(f)
+        size = pyrana.iobridge._seek(h, 0, pyrana.iobridge.AVSEEK_SIZE)
+        self.assertEqual(size, _BLEN)
+        self.assertEqual(f.tell(), 128)
+
+    def test_seek_size_file(self):
+        ffh = pyrana.ff.get_handle()
+        with open(__file__, 'rb') as f:
+            h = ffh.ffi.new_handle(f)
+            size = pyrana.iobridge._seek(h, 0, pyrana.iobridge.AVSEEK_SIZE)
+            self.assertEqual(size, os.path.getsize(__file__))
+            self.assertEqual(f.tell(), 0)
+
+    def test_seek_size_unseekable(self):
+        ffh = pyrana.ff.get_handle()
+        h = ffh.ffi.new_handle(io.RawIOBase())
+        size = pyrana.iobridge._seek(h, 0, pyrana.iobridge.AVSEEK_SIZE)
+        self.assertEqual(size, -1)
+
+    def test_seek_size_hint(self):
+        ffh = pyrana.ff.get_handle()
+        h = ffh.ffi.new_handle(io.RawIOBase())
+        seek = pyrana.iobridge._make_seek(4242)
+        self.assertEqual(seek(h, 0, pyrana.iobridge.AVSEEK_SIZE), 4242)
+
+    def test_seek_force(self):
+        ffh = pyrana.ff.get_handle()
+        f = io.BytesIO(_BZ)
+        h = ffh.ffi.new_handle(f)
+        whence = io.SEEK_SET | pyrana.iobridge.AVSEEK_FORCE
+        pyrana.iobridge._seek(h, 128, whence)
+        self.assertEqual(f.tell(), 128)
+
+
+class TestMemorySource(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pyrana.setup()
+
+    def setUp(self):
+        self.ffh = pyrana.ff.get_handle()
+        self.buf = self.ffh.ffi.new('uint8_t[]', 16)
+
+    def _handle(self, data):
+        src = pyrana.iobridge.MemorySource(data)
+        return src, self.ffh.ffi.new_handle(src)
+
+    def test_new(self):
+        src = pyrana.iobridge.MemorySource(_BZ)
+        assert len(src) == _BLEN
+        assert repr(src)
+
+    def test_read(self):
+        src, h = self._handle(b'0123456789')
+        assert pyrana.iobridge._mem_read(h, self.buf, 4) == 4
+        assert bytes(self.ffh.ffi.buffer(self.buf, 4)) == b'0123'
+        assert src.pos == 4
+
+    def test_read_eof(self):
+        src, h = self._handle(bytearray(b'0123'))
+        assert pyrana.iobridge._mem_read(h, self.buf, 16) == 4
+        assert pyrana.iobridge._mem_read(h, self.buf, 16) == 0
+
+    def test_read_memoryview_slice(self):
+        src, h = self._handle(memoryview(b'abcdef')[2:])
+        assert pyrana.iobridge._mem_read(h, self.buf, 16) == 4
+        assert bytes(self.ffh.ffi.buffer(self.buf, 4)) == b'cdef'
+
+    def test_seek_size(self):
+        src, h = self._handle(_BZ)
+        size = pyrana.iobridge._mem_seek(h, 0, pyrana.iobridge.AVSEEK_SIZE)
+        assert size == _BLEN
+        assert src.pos == 0
+
+    def test_seek(self):
+        src, h = self._handle(b'0123456789')
+        assert pyrana.iobridge._mem_seek(h, 4, io.SEEK_SET) == 4
+        assert pyrana.iobridge._mem_seek(h, 2, io.SEEK_CUR) == 6
+        whence = io.SEEK_END | pyrana.iobridge.AVSEEK_FORCE
+        assert pyrana.iobridge._mem_seek(h, -2, whence) == 8
+        assert pyrana.iobridge._mem_read(h, self.buf, 4) == 2
+
+    def test_seek_out_of_range(self):
+        src, h = self._handle(b'0123456789')
+        assert pyrana.iobridge._mem_seek(h, 11, io.SEEK_SET) == -1
+        assert pyrana.iobridge._mem_seek(h, -1, io.SEEK_SET) == -1
+        assert src.pos == 0
+
+    def test_iosource_wraps(self):
+        src = pyrana.iobridge.iosource(_BZ, False)
+        assert src.seekable
+
+
+class SlowSource(io.BytesIO):
+    def __init__(self, data, delay=0.001):
+        super(SlowSource, self).__init__(data)
+        self.delay = delay
+
+    def read(self, size=-1):
+        time.sleep(self.delay)
+        return super(SlowSource, self).read(size)
+
+
+class FaultySource(io.BytesIO):
+    def read(self, size=-1):
+        raise IOError("faulty")
+
+
+def _drain(src, size=1000):
+    data = bytearray()
+    buf = bytearray(size)
+    while True:
+        num = src.readinto(buf)
+        if num == 0:
+            return bytes(data)
+        data.extend(buf[:num])
+
+
+class TestReadAhead(unittest.TestCase):
+    def setUp(self):
+        self.data = bytes(bytearray(range(256))) * (_BLEN // 256)
+
+    def test_new(self):
+        src = pyrana.iobridge.ReadAhead(io.BytesIO(self.data))
+        assert repr(src)
+        assert src.readable()
+        assert not src.seekable()
+        src.close()
+
+    def test_bad_watermarks(self):
+        with self.assertRaises(pyrana.errors.SetupError):
+            pyrana.iobridge.ReadAhead(io.BytesIO(self.data), high=4, low=4)
+
+    def test_read_all(self):
+        src = pyrana.iobridge.ReadAhead(io.BytesIO(self.data),
+                                        high=8192, low=2048,
+                                        chunk_size=3000)
+        assert _drain(src) == self.data
+        assert src.buffered == 0
+
+    def test_read_into_cffi_buffer(self):
+        ffi = cffi.FFI()
+        cbuf = ffi.new('uint8_t[]', 4096)
+        src = pyrana.iobridge.ReadAhead(io.BytesIO(self.data))
+        num = src.readinto(ffi.buffer(cbuf))
+        assert ffi.buffer(cbuf, num)[:] == self.data[:num]
+
+    def test_throttles(self):
+        src = pyrana.iobridge.ReadAhead(io.BytesIO(self.data),
+                                        high=4096, low=1024,
+                                        chunk_size=1024)
+        src._worker.join(0.1)
+        assert src.throttles >= 1
+        assert src.buffered <= 4096
+        assert _drain(src) == self.data
+        assert src.peak <= 4096
+
+    def test_stalls(self):
+        src = pyrana.iobridge.ReadAhead(SlowSource(self.data, 0.01),
+                                        chunk_size=4096)
+        assert _drain(src) == self.data
+        assert src.stalls > 0
+
+    def test_error(self):
+        src = pyrana.iobridge.ReadAhead(FaultySource(self.data))
+        with self.assertRaises(IOError):
+            src.readinto(bytearray(16))
+
+    def test_close(self):
+        src = pyrana.iobridge.ReadAhead(io.BytesIO(self.data),
+                                        high=4096, low=1024,
+                                        chunk_size=1024)
+        src.close()
+        src._worker.join(1.0)
+        assert not src._worker.is_alive()
+        assert src.readinto(bytearray(16)) == 0
+
+
+class TestCoalescingSink(unittest.TestCase):
+    def setUp(self):
+        self.f = io.BytesIO()
+        self.f.name = 'bio'
+
+    def test_new(self):
+        dst = pyrana.iobridge.CoalescingSink(self.f, 1024)
+        assert repr(dst)
+        assert dst.writable()
+        assert dst.name == 'bio'
+
+    def test_below_threshold(self):
+        dst = pyrana.iobridge.CoalescingSink(self.f, 1024)
+        assert dst.write(b'x' * 512) == 512
+        assert dst.pending == 512
+        assert self.f.tell() == 0
+        assert dst.tell() == 512
+
+    def test_threshold(self):
+        dst = pyrana.iobridge.CoalescingSink(self.f, 1024)
+        for _ in range(8):
+            dst.write(b'x' * 256)
+        assert dst.writes == 8
+        assert dst.flushes == 2
+        assert self.f.getvalue() == b'x' * 2048
+
+    def test_flush(self):
+        dst = pyrana.iobridge.CoalescingSink(self.f, 1024)
+        dst.write(b'abc')
+        dst.flush()
+        assert dst.pending == 0
+        assert self.f.getvalue() == b'abc'
+
+    def test_seek_writes_out(self):
+        dst = pyrana.iobridge.CoalescingSink(self.f, 1024)
+        dst.write(b'abcd')
+        dst.seek(1)
+        dst.write(b'X')
+        dst.flush()
+        assert self.f.getvalue() == b'aXcd'
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -5,6 +5,7 @@ import unittest
 import hashlib
 import os
 import os.path
+import tempfile
 
 import pyrana
 import pyrana.ff
@@ -16,6 +17,8 @@ from pyrana.formats import STREAM_ANY
 from pyrana.video import PixelFormat
 from pyrana.audio import SampleFormat, ChannelLayout
 
+from tests import fakes
+
 
 
 class TestMuxer(unittest.TestCase):
@@ -157,6 +160,42 @@ class TestMuxer(unittest.TestCase):
         with self.assertRaises(pyrana.errors.ProcessingError):
             mux.write_trailer()
 
+    def test_write_trailer_coalesce(self):
+        mux = pyrana.formats.Muxer(self.f, name='avi', coalesce=1024 * 1024)
+        mux.open_encoder('mjpeg', self.vparams)
+        mux.write_header()
+        assert self.f.tell() == 0
+        mux.write_trailer()
+        assert self.f.tell() > 0
+
+    def test_to_path_write_trailer(self):
+        with tempfile.NamedTemporaryFile(suffix='.avi') as tmp:
+            mux = pyrana.formats.Muxer.to_path(tmp.name)
+            mux.open_encoder('mjpeg', self.vparams)
+            mux.write_header()
+            mux.write_trailer()
+            assert os.path.getsize(tmp.name) > 0
+
+    def test_to_path_bytes(self):
+        with tempfile.NamedTemporaryFile(suffix='.avi') as tmp:
+            mux = pyrana.formats.Muxer.to_path(tmp.name.encode('utf-8'))
+            mux.open_encoder('mjpeg', self.vparams)
+            mux.write_header()
+            mux.write_trailer()
+            assert os.path.getsize(tmp.name) > 0
+
+    def test_close_io_half_built(self):
+        # as left by a __init__ failing early.
+        mux = object.__new__(pyrana.formats.Muxer)
+        mux._close_io()
+        mux._ff = fakes.FF(faulty=False)
+        mux._pctx = [None]
+        mux._close_io()
+
+    def test_to_path_unknown_format(self):
+        with self.assertRaises(pyrana.errors.SetupError):
+            mux = pyrana.formats.Muxer.to_path('bio')
+
     def test_write_frame_audio(self):
         mux, xenc = self._open('avi', (('flac', self.aparams),))
         # TODO FIXME
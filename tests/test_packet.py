@@ -3,6 +3,8 @@
 import sys
 import unittest
 import pytest
+import pyrana
+import pyrana.ff
 import pyrana.packet
 import pyrana.errors
 
@@ -84,6 +86,7 @@ class TestPacket(unittest.TestCase):
         self.assertTrue(f.pts == pyrana.TS_NULL)
         self.assertTrue(f.dts == pyrana.TS_NULL)
         self.assertTrue(f.stream_id  == 0)
+        self.assertTrue(f.pos == -1)
 
     def test_init_values(self):
         f = pyrana.packet.Packet(3, "abracadabra".encode('utf-8'),
@@ -157,6 +160,128 @@ class TestPacket(unittest.TestCase):
         for i in range(len(f)):
             assert(f[i] == f.data[i])
 
+    def test_get_slice(self):
+        f = pyrana.packet.Packet(0, b'cthlhu')
+        assert(f[1:4] == b'thl')
+
+    def test_view(self):
+        pkt = pyrana.packet.Packet(0, b'cthlhu')
+        view = pkt.view()
+        assert(view.readonly)
+        assert(bytes(view) == pkt.data)
+        with self.assertRaises(TypeError):
+            view[0] = 0
+
+    def test_view_copy(self):
+        # what python < 3.8 gets.
+        zero_copy = pyrana.packet._ZERO_COPY_VIEW
+        pyrana.packet._ZERO_COPY_VIEW = False
+        try:
+            view = pyrana.packet.Packet(0, b'cthlhu').view()
+        finally:
+            pyrana.packet._ZERO_COPY_VIEW = zero_copy
+        assert(view.readonly)
+        assert(bytes(view) == b'cthlhu')
+        with self.assertRaises(TypeError):
+            view[0] = 0
+
+    def test_view_keeps_packet(self):
+        view = pyrana.packet.Packet(0, b'cthlhu').view()
+        assert(bytes(view) == b'cthlhu')
+
+    def test_eq(self):
+        pkt = pyrana.packet.Packet(0, b'cthlhu')
+        assert(pkt == pyrana.packet.Packet(1, b'cthlhu'))
+        assert(pkt != pyrana.packet.Packet(0, b'dagon'))
+        assert(pkt != b'cthlhu')
+
+    def test_hash_matches(self):
+        pkt = pyrana.packet.Packet(0, b'cthlhu')
+        assert(hash(pkt) == hash(b'cthlhu'))
+        assert(hash(pkt) == hash(pyrana.packet.Packet(1, b'cthlhu')))
+
+
+
+class TestPacketPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pyrana.setup()
+
+    def test_new(self):
+        pool = pyrana.packet.PacketPool(4)
+        assert(len(pool) == pool.size == 4)
+        assert(repr(pool))
+
+    def test_recycle(self):
+        ffh = pyrana.ff.get_handle()
+        pool = pyrana.packet.PacketPool(2)
+        cpkt = pool.new_cpkt(ffh, 16)
+        assert(len(pool) == 1)
+        pkt = pyrana.packet.Packet.from_cdata(cpkt, pool)
+        assert(pkt.size == 16)
+        del pkt
+        assert(len(pool) == 2)
+        assert(pool.recycled == 1)
+
+    def test_exhausted(self):
+        ffh = pyrana.ff.get_handle()
+        pool = pyrana.packet.PacketPool(1)
+        pkts = [pyrana.packet.Packet.from_cdata(pool.new_cpkt(ffh, 0), pool)
+                for _ in range(3)]
+        assert(pool.allocated == 2)
+        del pkts
+        assert(len(pool) == 1)
+
+    def test_faulty_alloc(self):
+        ffh = fakes.FF(faulty=True)
+        pool = pyrana.packet.PacketPool(1)
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            pool.new_cpkt(ffh, 128)
+        assert(len(pool) == 1)
+
+    def test_slots(self):
+        pkt = pyrana.packet.Packet(0, _B)
+        with self.assertRaises(AttributeError):
+            pkt.foobar = 42
+
+
+class TestPacketBatch(unittest.TestCase):
+    def _batch(self):
+        batch = pyrana.packet.PacketBatch()
+        batch.append(0, 10, 9, 1, b'abc')
+        batch.append(1, 20, 19, 0, b'')
+        batch.append(0, 30, 29, 0, b'defgh')
+        return batch
+
+    def test_new_empty(self):
+        batch = pyrana.packet.PacketBatch()
+        assert(len(batch) == 0)
+        assert(repr(batch))
+
+    def test_append(self):
+        batch = self._batch()
+        assert(len(batch) == 3)
+        assert(list(batch.sizes) == [3, 0, 5])
+        assert(list(batch.offsets) == [0, 3, 3])
+        assert(batch.data == b'abcdefgh')
+
+    def test_payload(self):
+        batch = self._batch()
+        assert(bytes(batch.payload(0)) == b'abc')
+        assert(bytes(batch.payload(1)) == b'')
+        assert(bytes(batch.payload(2)) == b'defgh')
+
+    def test_is_key(self):
+        batch = self._batch()
+        assert(batch.is_key(0))
+        assert(not batch.is_key(2))
+
+    def test_get_packet(self):
+        batch = self._batch()
+        pkt = batch[2]
+        assert(pkt.stream_id == 0)
+        assert(pkt.pts == 30 and pkt.dts == 29)
+        assert(bytes(pkt) == b'defgh')
 
 
 if __name__ == "__main__":
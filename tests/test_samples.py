@@ -56,6 +56,50 @@ class TestSamples(unittest.TestCase):
         assert(ffh.swr.ctx_allocs == 1)
         assert(ffh.swr.ctx_inited == 1)
 
+    def test_cannot_init_swr_context_freed(self):
+        smpfmt = pyrana.audio.SampleFormat.AV_SAMPLE_FMT_FLTP
+        frame = fakes.Frame(smpfmt)
+        ffh = fakes.FF(faulty=False)
+        ffh.swr = fakes.Swr(faulty=False, bad_smp_fmt=smpfmt)
+        with self.assertRaises(pyrana.errors.ProcessingError):
+            pyrana.audio._samples_from_frame(ffh, None, frame, smpfmt)
+        assert(ffh.swr.ctx_freed == 1)
+
+    def test_reuse_swr_context(self):
+        smpfmt = pyrana.audio.SampleFormat.AV_SAMPLE_FMT_FLTP
+        frame = fakes.Frame(smpfmt)
+        ffh = fakes.FF(faulty=False)
+        resamplers = pyrana.audio._new_resamplers(ffh)
+        for _ in range(3):
+            with self.assertRaises(pyrana.errors.ProcessingError):
+                pyrana.audio._samples_from_frame(ffh, None, frame, smpfmt,
+                                                 resamplers)
+        assert(ffh.swr.ctx_allocs == 1)
+        assert(ffh.swr.ctx_inited == 1)
+        assert(ffh.swr.conversions == 3)
+        assert(ffh.swr.ctx_freed == 0)
+
+    def test_no_reuse_without_resamplers(self):
+        smpfmt = pyrana.audio.SampleFormat.AV_SAMPLE_FMT_FLTP
+        frame = fakes.Frame(smpfmt)
+        ffh = fakes.FF(faulty=False)
+        for _ in range(2):
+            with self.assertRaises(pyrana.errors.ProcessingError):
+                pyrana.audio._samples_from_frame(ffh, None, frame, smpfmt)
+        assert(ffh.swr.ctx_allocs == 2)
+        assert(ffh.swr.ctx_freed == 2)
+
+    def test_resamplers_per_stream(self):
+        smpfmt = pyrana.audio.SampleFormat.AV_SAMPLE_FMT_FLTP
+        frame = fakes.Frame(smpfmt)
+        ffh = fakes.FF(faulty=False)
+        for resamplers in (pyrana.audio._new_resamplers(ffh),
+                           pyrana.audio._new_resamplers(ffh)):
+            with self.assertRaises(pyrana.errors.ProcessingError):
+                pyrana.audio._samples_from_frame(ffh, None, frame, smpfmt,
+                                                 resamplers)
+        assert(ffh.swr.ctx_allocs == 2)
+
     def test_cannot_alloc_samples(self):
         smpfmt = pyrana.audio.SampleFormat.AV_SAMPLE_FMT_FLTP
         frame = fakes.Frame(smpfmt)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+"""
+Precompiles the FFI module for the installed FFMpeg libraries,
+so pyrana.setup() can skip the parsing of the hfiles.
+The module is out-of-line in ABI mode: no C compiler is needed.
+pyrana falls back to parse the hfiles if the module is missing,
+or if it was built from different hfiles.
+"""
+
+import os.path
+import argparse
+import cffi
+from pyrana.ff import HLoader, versions, module_name, _gather
+
+
+def build(hfiles, outdir):
+    """
+    builds the FFI module for the given hfiles into outdir.
+    Returns the path of the module.
+    """
+    ffibuilder = cffi.FFI()
+    ffibuilder.set_source('pyrana.%s' % module_name(hfiles), None)
+    ffibuilder.cdef(_gather(hfiles))
+    return ffibuilder.compile(tmpdir=outdir)
+
+
+def _main():
+    argp = argparse.ArgumentParser()
+    argp.add_argument(
+        '-o',
+        '--outdir',
+        default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        help='root directory of the pyrana package')
+    args = argp.parse_args()
+
+    hl = HLoader(versions())
+    print(build(hl.hfiles, args.outdir))
+
+if __name__ == '__main__':
+    _main()